@@ -1,18 +1,105 @@
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Annotated, List, Dict, Optional, Literal, Union
+from contextlib import asynccontextmanager, contextmanager, aclosing, nullcontext, ExitStack
+from functools import partial
+import asyncio
+import json
 import os
+import random
+import time
 from dotenv import load_dotenv
-from crossword_generator import generate_crossword
-from llm_definition import batch_generate_definitions
-from crossword_html import generate_crossword_html
-import tempfile
+from crossword_generator import (generate_crossword, generate_best_crossword, edit_crossword,
+                                 get_generation_pool, GENERATOR_WORKERS, GENERATOR_VERSION,
+                                 MAX_GRID_SIZE)
+from llm_definition import (abatch_generate_definitions, close_async_client, is_error_definition,
+                            DASHSCOPE_MODEL, PROMPT_VERSION, LLM_BATCH_SIZE, LLM_CONCURRENCY)
+from crossword_html import render_crossword_html
+from fill_generator import fill_crossword, parse_pattern, PATTERNS
+from word_pack import WordPack, load_packs, word_set_key, PACK_DIR
+from compact_payload import wants_compact, dumps_compact, COMPACT_MEDIA_TYPE
+from clue_cache import get_clue_cache, normalize_word
+from response_utils import make_etag, etag_matches, encode_body
+from result_cache import ResultCache, make_result_key
+from metrics import (STAGE_SECONDS, REQUESTS, CACHE_LOOKUPS, CACHE_HIT_RATIO, CACHE_ENTRIES,
+                     render_metrics)
 
 load_dotenv()
 
-app = FastAPI(title="Crossword API")
+# 超过 执行数+排队上限 的请求直接返回 503
+GENERATION_QUEUE_LIMIT = int(os.getenv("GENERATION_QUEUE_LIMIT", 32))
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", 64))
+# 是否在响应中附带 Server-Timing 头（浏览器开发者工具可直接显示各阶段耗时）
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") != "0"
+# /api/crossword/batch 单次请求最多包含的谜题数
+BATCH_MAX_PUZZLES = int(os.getenv("BATCH_MAX_PUZZLES", 50))
+# 多候选生成的候选数上限和墙钟期限上限（未指定 deadline_ms 时也按该期限截止）
+ATTEMPTS_MAX = int(os.getenv("ATTEMPTS_MAX", 32))
+DEADLINE_MAX_MS = int(os.getenv("DEADLINE_MAX_MS", 10000))
+# search 引擎单次生成的时间预算和节点预算上限
+SEARCH_MAX_MS = int(os.getenv("SEARCH_MAX_MS", 5000))
+SEARCH_MAX_NODES = int(os.getenv("SEARCH_MAX_NODES", 200000))
+# /api/crossword/edit 的布局单词数和新增单词数上限
+EDIT_MAX_WORDS = int(os.getenv("EDIT_MAX_WORDS", 200))
+
+class StageLimiter:
+    """限制某个阶段同时在途（执行中 + 排队中）的任务数，饱和时返回 503"""
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+
+    def check(self):
+        """饱和时抛出 503，不占用名额"""
+        if self.active >= self.limit:
+            raise HTTPException(status_code=503, detail=f"{self.name} 繁忙，请稍后重试",
+                                headers={"Retry-After": "1"})
+
+    def __enter__(self):
+        self.check()
+        self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.active -= 1
+
+    @contextmanager
+    def reserve(self, count: int):
+        """额外占用 count 个名额（多候选生成一个请求向进程池提交多个任务），不足时返回 503"""
+        count = max(0, min(count, self.limit - 1))
+        if self.active + count > self.limit:
+            raise HTTPException(status_code=503, detail=f"{self.name} 繁忙，请稍后重试",
+                                headers={"Retry-After": "1"})
+        self.active += count
+        try:
+            yield self
+        finally:
+            self.active -= count
+
+generation_limiter = StageLimiter("generation", GENERATOR_WORKERS + GENERATION_QUEUE_LIMIT)
+llm_limiter = StageLimiter("llm", LLM_QUEUE_LIMIT)
+result_cache = ResultCache()
+# 启动时从 PACK_DIR 加载的词表包，按名称和单词集合索引
+packs: Dict[str, WordPack] = {}
+packs_by_words: Dict[frozenset, WordPack] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    packs.update(load_packs(PACK_DIR))
+    packs_by_words.update((pack.key, pack) for pack in packs.values())
+    if packs:
+        print(f"已加载 {len(packs)} 个词表包: {', '.join(packs)}")
+    yield
+    await close_async_client()
+    for pack in packs.values():
+        pack.close()
+    packs.clear()
+    packs_by_words.clear()
+
+app = FastAPI(title="Crossword API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -21,10 +108,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 去掉前后空格后不能为空
+PuzzleWord = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
 class GenerateRequest(BaseModel):
-    words: List[str]
-    size: Optional[int] = 12
+    words: List[PuzzleWord]
+    # 为空时根据单词自动选择尺寸，结果会裁剪到单词的包围盒
+    size: Optional[int] = Field(None, ge=1, le=MAX_GRID_SIZE)
     use_llm: Optional[bool] = True
+    # 'greedy' 速度最快；'search' 回溯搜索，质量更好但更慢
+    engine: Optional[Literal['greedy', 'search']] = 'greedy'
+    time_budget_ms: Optional[int] = Field(None, ge=1, le=SEARCH_MAX_MS)
+    node_budget: Optional[int] = Field(None, ge=1, le=SEARCH_MAX_NODES)
+    # attempts > 1 时并行生成多个候选并返回评分最高的布局
+    attempts: Optional[int] = Field(1, ge=1, le=ATTEMPTS_MAX)
+    seed: Optional[int] = None
+    deadline_ms: Optional[int] = Field(None, ge=1, le=DEADLINE_MAX_MS)
+
+class BatchRequest(BaseModel):
+    puzzles: List[GenerateRequest]
+
+# 单词不可能长于网格边长
+GridWord = Annotated[str, Field(max_length=MAX_GRID_SIZE)]
+
+class LayoutEntry(BaseModel):
+    word: str = Field(min_length=1, max_length=MAX_GRID_SIZE)
+    # 负坐标会被当作从末尾计数的下标；坐标决定重建网格的大小，不能超出网格上限
+    row: int = Field(ge=0, lt=MAX_GRID_SIZE)
+    col: int = Field(ge=0, lt=MAX_GRID_SIZE)
+    direction: Literal['across', 'down']
+
+class EditRequest(BaseModel):
+    # 当前布局（/api/crossword 返回的 layout），网格由布局重建
+    layout: List[LayoutEntry] = Field(max_length=EDIT_MAX_WORDS)
+    add: List[GridWord] = Field([], max_length=EDIT_MAX_WORDS)
+    remove: List[str] = Field([], max_length=EDIT_MAX_WORDS)
+    use_llm: Optional[bool] = True
+    # 为 True 时同时返回完整的 grid 和 layout
+    full: Optional[bool] = False
+
+class FillRequest(BaseModel):
+    # 内置图案名（见 /api/fill/patterns）或行列表，'#' 为黑格，'.' 为待填格
+    pattern: Union[str, List[str]] = '15x15'
+    use_llm: Optional[bool] = True
+    seed: Optional[int] = None
+    time_budget_ms: Optional[int] = Field(None, ge=1, le=SEARCH_MAX_MS)
 
 class GenerateHTMLRequest(BaseModel):
     grid: List[List[str]]
@@ -32,50 +160,538 @@ class GenerateHTMLRequest(BaseModel):
     clues: Dict[str, str]
     style: Optional[str] = 'classic'
 
-@app.post("/api/crossword")
-async def api_crossword(req: GenerateRequest):
+# 流式响应不能缓存，并关闭反向代理（nginx）的缓冲，保证每段数据立即送达
+STREAM_HEADERS = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def server_timing_headers(durations: Dict[str, float], desc: Optional[str] = None) -> Dict[str, str]:
+    """由 {阶段: 毫秒} 生成 Server-Timing 头，desc 作为首个条目的说明（如缓存状态）"""
+    if not SERVER_TIMING:
+        return {}
+    entries = [f'cache;desc="{desc}"'] if desc else []
+    entries.extend(f"{name};dur={ms}" for name, ms in durations.items())
+    return {"Server-Timing": ", ".join(entries)}
+
+async def run_generation(req: GenerateRequest):
+    """在进程池中生成布局，返回 (grid, layout, seed, 耗时毫秒)"""
+    start = time.perf_counter()
+    time_budget = req.time_budget_ms / 1000 if req.time_budget_ms is not None else None
+    seed = req.seed
+    if req.attempts and req.attempts > 1:
+        # generate_best_crossword 自己向进程池分发候选，这里只需避免阻塞事件循环；
+        # 请求本身已占用一个生成名额，其余候选各再占一个
+        deadline = (req.deadline_ms if req.deadline_ms is not None else DEADLINE_MAX_MS) / 1000
+        with generation_limiter.reserve(req.attempts - 1):
+            grid, layout, seed = await asyncio.to_thread(
+                generate_best_crossword, req.words, req.size, req.attempts, seed, deadline,
+                req.engine, time_budget, req.node_budget)
+    else:
+        loop = asyncio.get_running_loop()
+        grid, layout = await loop.run_in_executor(get_generation_pool(), partial(
+            generate_crossword, req.words, req.size, req.engine, time_budget, req.node_budget, seed))
+    # 生成在子进程中执行，耗时（含排队）在这里统计
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="generate")
+    return grid, layout, seed, _elapsed_ms(start)
+
+def fallback_clues(words: List[str]) -> Dict[str, str]:
+    return {w: f"What is '{w}'?" for w in words}
+
+async def fetch_clues(words: List[str], use_llm: bool):
+    """获取提示，LLM 失败时使用单词本身作为提示，返回 (clues, 耗时毫秒, 是否降级)"""
+    start = time.perf_counter()
+    if not use_llm:
+        return fallback_clues(words), 0.0, False
+    try:
+        clues = await abatch_generate_definitions(words)
+    except Exception:
+        return fallback_clues(words), _elapsed_ms(start), True
+    degraded = any(is_error_definition(c) for c in clues.values())
+    return clues, _elapsed_ms(start), degraded
+
+def result_cache_key(req: GenerateRequest) -> str:
+    """规范化请求：补全默认值并去掉对结果没有影响的字段，再计算内容哈希"""
+    attempts = max(1, req.attempts or 1)
+    payload = {
+        "words": req.words,
+        "size": req.size,
+        "use_llm": bool(req.use_llm),
+        "engine": req.engine or 'greedy',
+        "attempts": attempts,
+        "seed": req.seed,
+    }
+    if payload["engine"] == 'search':
+        payload["time_budget_ms"] = req.time_budget_ms
+        payload["node_budget"] = req.node_budget
+    if attempts > 1:
+        payload["deadline_ms"] = req.deadline_ms
+    if payload["use_llm"]:
+        # 模型或提示词变化时提示内容不同，不能复用旧结果
+        payload["model"] = DASHSCOPE_MODEL
+        payload["prompt_version"] = PROMPT_VERSION
+    return make_result_key(payload, GENERATOR_VERSION)
+
+async def build_crossword(req: GenerateRequest):
+    """生成布局并获取提示，返回 (响应内容, 是否降级)"""
+    with generation_limiter, (llm_limiter if req.use_llm else nullcontext()):
+        return await compose_crossword(req, run_generation, fetch_clues)
+
+async def compose_crossword(req: GenerateRequest, generate, clue_source):
+    """由 generate(req) 和 clue_source(words, use_llm) 组装谜题，不做准入限制"""
+    start = time.perf_counter()
     words = req.words
-    grid, layout = generate_crossword(words, req.size)
-    clues: Dict[str, str] = {}
-    if req.use_llm:
+    # 布局生成与 LLM 调用互不依赖，并行执行
+    (grid, layout, seed, generate_ms), (clues, llm_ms, degraded) = await asyncio.gather(
+        generate(req), clue_source(words, req.use_llm))
+    placed = {entry['word'] for entry in layout}
+    unplaced = [w for w in words if w.upper() not in placed]
+    timing = {"generate_ms": generate_ms, "llm_ms": llm_ms, "total_ms": _elapsed_ms(start)}
+    return {"grid": grid, "layout": layout, "clues": clues, "unplaced": unplaced, "seed": seed,
+            "timing": timing}, degraded
+
+class SharedClues:
+    """批量请求中所有谜题共用的提示：同一个单词（忽略大小写）只向 LLM 请求一次
+
+    创建时先查解释缓存，未命中的单词按谜题顺序分批并发请求；每个谜题只等待
+    包含自己单词的那几批，先凑齐提示的谜题先返回。通过 create 创建。
+    """
+    def __init__(self, distinct: Dict[str, str], cached: Dict[str, str]):
+        self.known = {normalize_word(w): clue for w, clue in cached.items()}
+        self.distinct = len(distinct)
+        self.requested = self.distinct - len(self.known)
+        self._failed = set()
+        self._semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        pending = [w for key, w in distinct.items() if key not in self.known]
+        for i in range(0, len(pending), LLM_BATCH_SIZE):
+            batch = pending[i:i + LLM_BATCH_SIZE]
+            task = asyncio.ensure_future(self._fetch(batch))
+            for w in batch:
+                self._tasks[normalize_word(w)] = task
+
+    @classmethod
+    async def create(cls, words: List[str]) -> 'SharedClues':
+        """在线程中查询解释缓存（SQLite 读取会阻塞事件循环），然后开始请求未命中的单词"""
+        distinct: Dict[str, str] = {}
+        for w in words:
+            if w.strip():
+                distinct.setdefault(normalize_word(w), w)
+        cached = await asyncio.to_thread(
+            get_clue_cache().get_many, list(distinct.values()), DASHSCOPE_MODEL, PROMPT_VERSION)
+        return cls(distinct, cached)
+
+    async def _fetch(self, batch: List[str]) -> Dict[str, str]:
+        async with self._semaphore:
+            try:
+                return await abatch_generate_definitions(batch)
+            except Exception:
+                self._failed.update(normalize_word(w) for w in batch)
+                return fallback_clues(batch)
+
+    async def fetch(self, words: List[str], use_llm: bool):
+        """与 fetch_clues 相同的返回值 (clues, 耗时毫秒, 是否降级)"""
+        if not use_llm:
+            return fallback_clues(words), 0.0, False
+        start = time.perf_counter()
+        keys = [normalize_word(w) for w in words]
+        tasks = {id(task): task for task in (self._tasks.get(key) for key in keys) if task is not None}
+        # shield：某个谜题被取消时不能取消其他谜题也在等待的批次
+        for result in await asyncio.gather(*(asyncio.shield(t) for t in tasks.values())):
+            self.known.update((normalize_word(w), clue) for w, clue in result.items())
+        clues = {w: self.known[key] for w, key in zip(words, keys) if key in self.known}
+        return clues, _elapsed_ms(start), self.degraded(clues)
+
+    async def stream(self):
+        """依次产出新得到的提示 {规范化单词: 提示}：先是缓存命中的，然后每完成一批产出一批"""
+        if self.known:
+            yield dict(self.known)
+        for next_done in asyncio.as_completed(set(self._tasks.values())):
+            batch = {normalize_word(w): clue for w, clue in (await next_done).items()}
+            self.known.update(batch)
+            yield batch
+
+    def degraded(self, clues: Dict[str, str]) -> bool:
+        """提示中有 LLM 失败的占位或错误文本时视为降级，结果不缓存"""
+        return any(normalize_word(w) in self._failed or is_error_definition(clue) for w, clue in clues.items())
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+@app.post("/api/crossword/batch")
+async def api_crossword_batch(batch: BatchRequest, request: Request):
+    """批量生成：所有谜题的单词合并去重后统一获取提示，每个谜题完成后立即作为一行 NDJSON 返回
+
+    每行为 {"index": 序号, "cache": 缓存状态, ...谜题} 或 {"index": 序号, "error": 原因}，
+    最后一行为 {"summary": {...}}。
+    """
+    if not batch.puzzles:
+        raise HTTPException(status_code=422, detail="puzzles 不能为空")
+    if len(batch.puzzles) > BATCH_MAX_PUZZLES:
+        raise HTTPException(status_code=413, detail=f"单次最多 {BATCH_MAX_PUZZLES} 个谜题")
+    no_cache = "no-cache" in request.headers.get("cache-control", "").lower()
+    use_llm = any(req.use_llm for req in batch.puzzles)
+    # 整个批次计为一个请求；饱和时在开始响应前直接返回 503
+    check_capacity(use_llm)
+    return StreamingResponse(stream_batch(batch.puzzles, no_cache, use_llm),
+                             media_type="application/x-ndjson", headers=STREAM_HEADERS)
+
+def check_capacity(use_llm: bool):
+    """流式接口在开始响应前的检查：只判断是否饱和，不占用名额"""
+    generation_limiter.check()
+    if use_llm:
+        llm_limiter.check()
+
+def admit(use_llm: bool) -> ExitStack:
+    """在流式响应的生成器内占用各阶段名额，随生成器结束（含客户端断开）释放
+
+    名额不能在生成器外占用：响应还没开始迭代就失败时生成器的 finally 不会执行，名额会泄漏。
+    """
+    limits = ExitStack()
+    limits.enter_context(generation_limiter)
+    if use_llm:
+        try:
+            limits.enter_context(llm_limiter)
+        except HTTPException:
+            limits.close()
+            raise
+    return limits
+
+async def stream_batch(puzzles: List[GenerateRequest], no_cache: bool, use_llm: bool):
+    start = time.perf_counter()
+    try:
+        limits = admit(use_llm)
+    except HTTPException as e:
+        # 检查之后其他请求占满了名额
+        yield json.dumps({"error": e.detail}, ensure_ascii=False) + "\n"
+        return
+    # aclosing：客户端断开时内层生成器也立即结束，取消剩余任务后再释放名额
+    with limits:
+        async with aclosing(_batch_lines(puzzles, no_cache, start)) as lines:
+            async for line in lines:
+                yield line
+
+async def _batch_lines(puzzles: List[GenerateRequest], no_cache: bool, start: float):
+    # 批次内的生成任务分批进入进程池，避免一次占满队列让单个请求排在整批之后
+    slots = asyncio.Semaphore(GENERATOR_WORKERS)
+
+    async def generate(req: GenerateRequest):
+        async with slots:
+            return await run_generation(req)
+
+    # 先找出能直接由词表包或结果缓存返回的谜题，它们的单词不需要请求 LLM；
+    # 缓存结果在这里一次取出，之后被淘汰也不会用缺少提示的 SharedClues 重新拼装
+    plans = []
+    for req in puzzles:
+        pack = packs_by_words.get(word_set_key(req.words)) if req.size is None and not no_cache else None
+        key = result_cache_key(req)
+        cached = result_cache.get(key) if pack is None and not no_cache else None
+        plans.append((req, pack, key, cached))
+    shared = await SharedClues.create([w for req, pack, _, cached in plans
+                                       if req.use_llm and pack is None and cached is None for w in req.words])
+
+    async def one(index: int, req: GenerateRequest, pack: Optional[WordPack], key: str, cached):
+        try:
+            if pack is not None:
+                result, status = pack_puzzle(pack, req.words, req.seed, req.use_llm), "PACK"
+            elif cached is not None:
+                (result, _), status = cached, "HIT"
+            elif no_cache:
+                (result, _), status = await compose_crossword(req, generate, shared.fetch), "BYPASS"
+            else:
+                (result, _), status, _ = await result_cache.get_or_compute(
+                    key, partial(compose_crossword, req, generate, shared.fetch), lambda value: not value[1])
+        except Exception as e:
+            return {"index": index, "error": str(e) or type(e).__name__}
+        REQUESTS.inc(endpoint="batch", cache=status)
+        return dict(result, index=index, cache=status)
+
+    tasks = [asyncio.ensure_future(one(i, *plan)) for i, plan in enumerate(plans)]
+    errors = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            errors += "error" in item
+            yield json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+        summary = {"puzzles": len(puzzles), "errors": errors, "distinct_words": shared.distinct,
+                   "llm_words": shared.requested, "total_ms": _elapsed_ms(start)}
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+    finally:
+        # 客户端中途断开时停止剩余的工作
+        for task in tasks:
+            task.cancel()
+        shared.cancel()
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+@app.post("/api/crossword/stream")
+async def api_crossword_stream(req: GenerateRequest, request: Request):
+    """渐进式返回（Server-Sent Events）：布局生成后立即发送，提示随 LLM 批次完成陆续发送
+
+    事件依次为：
+      layout  {"grid", "layout", "unplaced", "seed", "timing"}
+      clues   {单词: 提示, ...}，可能有多个
+      done    {"timing", "cache"}
+      error   {"detail"}（生成失败时代替后续事件）
+    """
+    no_cache = "no-cache" in request.headers.get("cache-control", "").lower()
+    pack = packs_by_words.get(word_set_key(req.words)) if req.size is None and not no_cache else None
+    key = result_cache_key(req)
+    cached = None if no_cache else result_cache.peek(key)
+    cached = cached[0] if cached is not None else None
+    if pack is None and cached is None:
+        check_capacity(req.use_llm)
+    return StreamingResponse(stream_crossword(req, pack, cached, key),
+                             media_type="text/event-stream", headers=STREAM_HEADERS)
+
+async def stream_crossword(req: GenerateRequest, pack: Optional[WordPack], cached: Optional[Dict],
+                           key: str):
+    start = time.perf_counter()
+    if pack is not None or cached is not None:
+        # 词表包和缓存的结果已经完整，一次发出
+        status = "PACK" if pack is not None else "HIT"
+        result = pack_puzzle(pack, req.words, req.seed, req.use_llm) if pack is not None else cached
+        REQUESTS.inc(endpoint="stream", cache=status)
+        yield sse_event("layout", {k: result[k] for k in ("grid", "layout", "unplaced", "seed")})
+        yield sse_event("clues", result["clues"])
+        yield sse_event("done", {"timing": result["timing"], "cache": status})
+        return
+
+    try:
+        limits = admit(req.use_llm)
+    except HTTPException as e:
+        yield sse_event("error", {"detail": e.detail})
+        return
+    with limits:
+        async with aclosing(_stream_events(req, key, start)) as events:
+            async for event in events:
+                yield event
+
+async def _stream_events(req: GenerateRequest, key: str, start: float):
+    # LLM 请求在生成布局的同时开始
+    llm_start = time.perf_counter()
+    shared = await SharedClues.create(req.words) if req.use_llm else None
+    try:
         try:
-            clues = batch_generate_definitions(words)
+            grid, layout, seed, generate_ms = await run_generation(req)
         except Exception as e:
-            # 如果LLM失败，使用单词本身作为提示
-            clues = {w: f"What is '{w}'?" for w in words}
+            yield sse_event("error", {"detail": str(e) or type(e).__name__})
+            return
+        placed = {entry['word'] for entry in layout}
+        unplaced = [w for w in req.words if w.upper() not in placed]
+        yield sse_event("layout", {"grid": grid, "layout": layout, "unplaced": unplaced, "seed": seed,
+                                   "timing": {"generate_ms": generate_ms, "total_ms": _elapsed_ms(start)}})
+        clues: Dict[str, str] = {}
+        llm_ms = 0.0
+        if shared is None:
+            clues = fallback_clues(req.words)
+            yield sse_event("clues", clues)
+        else:
+            async for batch in shared.stream():
+                # 从发出 LLM 请求到收到这一批的时间，不含等待客户端读取的时间
+                llm_ms = _elapsed_ms(llm_start)
+                new = {w: batch[normalize_word(w)] for w in req.words if normalize_word(w) in batch}
+                clues.update(new)
+                yield sse_event("clues", new)
+        timing = {"generate_ms": generate_ms, "llm_ms": llm_ms, "total_ms": _elapsed_ms(start)}
+        # 完整结果与 /api/crossword 的格式一致，写入结果缓存供后续请求复用
+        if shared is None or not shared.degraded(clues):
+            result_cache.put(key, ({"grid": grid, "layout": layout, "clues": clues, "unplaced": unplaced,
+                                    "seed": seed, "timing": timing}, False))
+        REQUESTS.inc(endpoint="stream", cache="MISS")
+        yield sse_event("done", {"timing": timing, "cache": "MISS"})
+    finally:
+        if shared is not None:
+            shared.cancel()
+
+@app.post("/api/crossword/edit")
+async def api_crossword_edit(req: EditRequest):
+    """增量编辑：保留已有单词的位置，只放置新增单词、只为新增单词获取提示，返回差异"""
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    current = [entry.model_dump() for entry in req.layout]
+    existing = {entry['word'] for entry in current}
+    new_words = [w for w in req.add if w.strip() and w.strip().upper() not in existing]
+
+    async def place():
+        edit_start = time.perf_counter()
+        result = await loop.run_in_executor(get_generation_pool(), partial(
+            edit_crossword, current, new_words, req.remove))
+        return result, _elapsed_ms(edit_start)
+
+    with generation_limiter, (llm_limiter if req.use_llm and new_words else nullcontext()):
+        try:
+            # 放置与获取提示互不依赖，并行执行；放不下的单词的提示随后丢弃
+            ((grid, layout, diff), edit_ms), (clues, llm_ms, _) = await asyncio.gather(
+                place(), fetch_clues(new_words, req.use_llm))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    added = {entry['word'] for entry in diff['added']}
+    result = {
+        "diff": diff,
+        "clues": {w: clue for w, clue in clues.items() if w.strip().upper() in added},
+        "timing": {"generate_ms": edit_ms, "llm_ms": llm_ms, "total_ms": _elapsed_ms(start)},
+    }
+    if req.full:
+        result.update({"grid": grid, "layout": layout})
+    REQUESTS.inc(endpoint="edit", cache="")
+    return JSONResponse(result, headers=server_timing_headers({"generate": edit_ms, "llm": llm_ms}))
+
+def pack_puzzle(pack: WordPack, words: List[str], seed: Optional[int], use_llm: bool = True) -> Dict:
+    """从词表包中取出一个预生成的谜题，不调用 LLM 也不生成布局"""
+    start = time.perf_counter()
+    index, grid, layout, layout_seed = pack.pick(seed)
+    clues = pack.clues_for(words) if use_llm else fallback_clues(words)
+    placed = {entry['word'] for entry in layout}
+    unplaced = [w for w in words if w.upper() not in placed]
+    timing = {"generate_ms": 0.0, "llm_ms": 0.0, "total_ms": _elapsed_ms(start)}
+    return {"grid": grid, "layout": layout, "clues": clues, "unplaced": unplaced, "seed": layout_seed,
+            "pack": {"name": pack.name, "index": index}, "timing": timing}
+
+@app.post("/api/crossword")
+async def api_crossword(req: GenerateRequest, request: Request):
+    start = time.perf_counter()
+    headers = {}
+    no_cache = "no-cache" in request.headers.get("cache-control", "").lower()
+    # 单词集合与某个词表包一致且未指定尺寸时，直接使用预生成的布局和提示
+    pack = packs_by_words.get(word_set_key(req.words)) if req.size is None and not no_cache else None
+    if pack is not None:
+        REQUESTS.inc(endpoint="crossword", cache="PACK")
+        return crossword_response(request, pack_puzzle(pack, req.words, req.seed, req.use_llm),
+                                  {"X-Cache": "PACK"}, {}, start, "PACK")
+    # 请求头 Cache-Control: no-cache 时跳过缓存强制重新生成
+    if no_cache:
+        result, _ = await build_crossword(req)
+        status = "BYPASS"
     else:
-        clues = {w: f"What is '{w}'?" for w in words}
-    return {"grid": grid, "layout": layout, "clues": clues}
+        # LLM 失败降级的结果不缓存
+        (result, _), status, age = await result_cache.get_or_compute(
+            result_cache_key(req), partial(build_crossword, req), lambda value: not value[1])
+        headers["Age"] = str(int(age))
+    headers["X-Cache"] = status
+    REQUESTS.inc(endpoint="crossword", cache=status)
+    durations = {}
+    if status in ("MISS", "BYPASS"):
+        # 命中缓存时 timing 是当初生成时的耗时，不再重复上报
+        durations = {"generate": result["timing"]["generate_ms"], "llm": result["timing"]["llm_ms"]}
+    return crossword_response(request, result, headers, durations, start, status)
+
+def crossword_response(request: Request, result: Dict, headers: Dict[str, str],
+                       durations: Dict[str, float], start: float, cache_status: str) -> Response:
+    """按客户端协商的格式序列化谜题：默认完整 JSON，format=compact 或对应 Accept 头时使用紧凑格式"""
+    serialize_start = time.perf_counter()
+    if wants_compact(request.query_params.get("format"), request.headers.get("accept")):
+        response = body_response(request, dumps_compact(result), COMPACT_MEDIA_TYPE,
+                                 dict(headers, Vary="Accept"))
+    else:
+        response = JSONResponse(result, headers=headers)
+    STAGE_SECONDS.observe(time.perf_counter() - serialize_start, stage="serialize")
+    durations = dict(durations, serialize=_elapsed_ms(serialize_start), total=_elapsed_ms(start))
+    response.headers.update(server_timing_headers(durations, cache_status))
+    return response
+
+@app.post("/api/fill")
+async def api_fill(req: FillRequest):
+    """密排模式：用词典填满黑格图案中的所有词槽"""
+    start = time.perf_counter()
+    seed = req.seed if req.seed is not None else random.randrange(2 ** 31)
+    time_budget = req.time_budget_ms / 1000 if req.time_budget_ms is not None else None
+    try:
+        rows = parse_pattern(req.pattern)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if len(rows) > MAX_GRID_SIZE or len(rows[0]) > MAX_GRID_SIZE:
+        raise HTTPException(status_code=422, detail=f"图案的行列数不能超过 {MAX_GRID_SIZE}")
+    loop = asyncio.get_running_loop()
+    with generation_limiter:
+        try:
+            # 每个工作进程首次调用时加载词典索引，之后复用
+            grid, layout = await loop.run_in_executor(get_generation_pool(), partial(
+                fill_crossword, rows, None, seed, time_budget))
+        except FileNotFoundError:
+            raise HTTPException(status_code=503, detail="未找到词典文件，请配置 FILL_DICTIONARY_PATH")
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    generate_ms = _elapsed_ms(start)
+    STAGE_SECONDS.observe(generate_ms / 1000, stage="generate")
+    words = [entry['word'] for entry in layout]
+    # 填好的单词要等求解完成后才知道，提示只能在之后获取
+    with (llm_limiter if req.use_llm else nullcontext()):
+        clues, llm_ms, _ = await fetch_clues(words, req.use_llm)
+    REQUESTS.inc(endpoint="fill", cache="")
+    timing = {"generate_ms": generate_ms, "llm_ms": llm_ms, "total_ms": _elapsed_ms(start)}
+    return JSONResponse({"grid": grid, "layout": layout, "clues": clues, "seed": seed, "timing": timing},
+                        headers=server_timing_headers({"generate": generate_ms, "llm": llm_ms}))
+
+@app.get("/api/packs")
+async def list_packs():
+    return [pack.info() for pack in packs.values()]
+
+@app.get("/api/packs/{name}/puzzle")
+async def pack_puzzle_endpoint(name: str, seed: Optional[int] = None):
+    """从指定词表包中取一个谜题，seed 相同时返回同一个布局"""
+    pack = packs.get(name)
+    if pack is None:
+        raise HTTPException(status_code=404, detail=f"词表包不存在: {name}")
+    REQUESTS.inc(endpoint="pack", cache="PACK")
+    return pack_puzzle(pack, pack.words, seed)
+
+@app.get("/api/fill/patterns")
+async def fill_patterns():
+    return PATTERNS
+
+def body_response(request: Request, body: bytes, media_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """返回带 ETag 的响应，按 Accept-Encoding 压缩
+
+    只有 GET/HEAD 在 If-None-Match 命中时返回 304（RFC 9110 不允许其他方法返回 304），
+    POST 响应仍带 ETag，客户端可以自行比较内容是否变化。
+    """
+    etag = make_etag(body)
+    headers = dict(headers or {})
+    vary = headers.get("Vary")
+    headers.update({"ETag": etag, "Vary": f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"})
+    if request.method in ("GET", "HEAD") and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content, encoding = encode_body(body, request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=media_type, headers=headers)
 
 @app.post("/api/generate-html")
-async def api_generate_html(req: GenerateHTMLRequest):
+async def api_generate_html(req: GenerateHTMLRequest, request: Request):
     """生成并返回HTML文件"""
+    start = time.perf_counter()
+    REQUESTS.inc(endpoint="generate-html", cache="")
     try:
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
-            temp_file = f.name
-        
-        # 生成HTML
-        generate_crossword_html(req.grid, req.layout, req.clues, temp_file, req.style)
-        
-        # 读取HTML内容
-        with open(temp_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        # 清理临时文件
-        os.unlink(temp_file)
-        
-        # 返回HTML内容
-        return Response(
-            content=html_content,
-            media_type="text/html",
-            headers={
-                "Content-Disposition": f'attachment; filename="crossword-{req.style}.html"'
-            }
-        )
+        html_content = await asyncio.to_thread(
+            render_crossword_html, req.grid, req.layout, req.clues, req.style)
+        headers = {"Content-Disposition": f'attachment; filename="crossword-{req.style}.html"'}
+        headers.update(server_timing_headers({"html": _elapsed_ms(start)}))
+        return body_response(request, html_content.encode('utf-8'), "text/html; charset=utf-8", headers)
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """返回解释缓存和结果缓存的命中统计"""
+    return {"clues": await asyncio.to_thread(get_clue_cache().stats), "results": result_cache.stats()}
+
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus 格式的指标"""
+    clue_stats = await asyncio.to_thread(get_clue_cache().stats)
+    for name, stats in (("clues", clue_stats), ("results", result_cache.stats())):
+        CACHE_LOOKUPS.set(stats["hits"], cache=name, result="hit")
+        CACHE_LOOKUPS.set(stats["misses"], cache=name, result="miss")
+        if "shared" in stats:
+            CACHE_LOOKUPS.set(stats["shared"], cache=name, result="shared")
+        CACHE_HIT_RATIO.set(stats["hit_rate"], cache=name)
+        CACHE_ENTRIES.set(stats.get("memory_size", stats.get("size", 0)), cache=name)
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+
+用法:
+    python benchmark.py generator --repeat 20
+    python benchmark.py html --size 30 --repeat 50
+    python benchmark.py api --requests 200 --concurrency 16
+    python benchmark.py config --clients 8 --renders 4
+    python benchmark.py all --output bench.json
+    python benchmark.py compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import crossword_html
+from crossword_generator import generate_crossword
+
+# 生成器基准的默认组合：(单词数, 网格尺寸)，尺寸为 None 表示自动
+GENERATOR_CASES = [(10, None), (10, 15), (30, None), (30, 20), (100, None), (100, 30), (300, None)]
+
+def random_words(count: int, rng: random.Random, min_len: int = 3, max_len: int = 9) -> List[str]:
+    """生成用于测试的随机“单词”，元音比例接近英文便于交叉"""
+    letters = 'eeeeaaaiioouttnnssrrllddhcmpbgkwy'
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(min_len, max_len))))
+    return sorted(words)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """返回毫秒样本的均值和分位数"""
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(pick(0.5), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+def measure(func: Callable, repeat: int) -> Dict[str, float]:
+    """多次运行 func，返回耗时统计（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+def peak_memory_kb(func: Callable) -> float:
+    """运行一次 func，返回 tracemalloc 统计的峰值内存（KiB）"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def bench_generator(cases, repeat: int, seed: int, engine: str = 'greedy') -> List[Dict]:
+    """不同单词数与网格尺寸下的生成耗时、放置率和峰值内存"""
+    results = []
+    for count, size in cases:
+        rng = random.Random(seed + count)
+        word_list = random_words(count, rng)
+        samples, placed = [], []
+        for i in range(repeat):
+            start = time.perf_counter()
+            _, layout = generate_crossword(word_list, size, engine, seed=seed + i)
+            samples.append((time.perf_counter() - start) * 1000)
+            placed.append(len(layout) / count)
+        results.append({
+            'words': count,
+            'size': size or 'auto',
+            'engine': engine,
+            **percentiles(samples),
+            'placement_rate': round(statistics.fmean(placed), 4),
+            'peak_kb': peak_memory_kb(lambda: generate_crossword(word_list, size, engine, seed=seed)),
+        })
+    return results
+
+def print_generator_results(results: List[Dict]):
+    print(f"{'words':>6} {'size':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'placed':>7} {'peak KiB':>9}")
+    for r in results:
+        print(f"{r['words']:>6} {r['size']:>5} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} "
+              f"{r['p95_ms']:>9.3f} {r['placement_rate']:>7.1%} {r['peak_kb']:>9.1f}")
+
+def _legacy_grid_html(grid, layout, size):
+    # 旧实现：逐格 += 拼接
+    number_map = {}
+    for entry in layout:
+        key = f"{entry['row']}-{entry['col']}"
+        if key not in number_map:
+            number_map[key] = entry['number']
+    grid_html = f'<div class="crossword-grid" style="grid-template-columns: repeat({size}, 1fr);">'
+    for r in range(len(grid)):
+        for c in range(size):
+            cell_value = grid[r][c]
+            if cell_value:
+                number = number_map.get(f"{r}-{c}", '')
+                number_html = f'<span class="cell-number">{number}</span>' if number else ''
+                grid_html += f'''
+                <div class="cell" data-row="{r}" data-col="{c}" data-answer="{cell_value}">
+                    {number_html}
+                    <input type="text" maxlength="1" class="cell-input" 
+                           oninput="handleInput(this)" onkeydown="handleKeydown(event, this)">
+                </div>'''
+            else:
+                grid_html += '<div class="cell cell-black"></div>'
+    grid_html += '</div>'
+    return grid_html
+
+def _legacy_clues_html(across_clues, down_clues):
+    clues_html = '<div class="clues-section">'
+    clues_html += '<div class="clues-group"><h3>横向</h3><ul class="clues-list">'
+    for clue in across_clues:
+        clues_html += f'<li><span class="clue-number">{clue["number"]}.</span> {clue["clue"]}</li>'
+    clues_html += '</ul></div>'
+    clues_html += '<div class="clues-group"><h3>纵向</h3><ul class="clues-list">'
+    for clue in down_clues:
+        clues_html += f'<li><span class="clue-number">{clue["number"]}.</span> {clue["clue"]}</li>'
+    clues_html += '</ul></div>'
+    clues_html += '</div>'
+    return clues_html
+
+@contextmanager
+def legacy_renderer():
+    """临时换回旧的渲染路径（字符串 += 拼接、每次重建 CSS），用于对比"""
+    saved = (crossword_html.generate_grid_html, crossword_html.generate_clues_html,
+             crossword_html.get_css_styles)
+    crossword_html.generate_grid_html = _legacy_grid_html
+    crossword_html.generate_clues_html = _legacy_clues_html
+    crossword_html.get_css_styles = crossword_html.build_css_styles
+    try:
+        yield
+    finally:
+        (crossword_html.generate_grid_html, crossword_html.generate_clues_html,
+         crossword_html.get_css_styles) = saved
+
+def bench_html(size: int, words: int, repeat: int, seed: int) -> Dict:
+    """对比新旧渲染路径在大网格上的耗时，并确认输出一致"""
+    rng = random.Random(seed)
+    word_list = random_words(words, rng)
+    grid, layout = generate_crossword(word_list, size, seed=seed, crop=False)
+    clues = {w: f"Clue for {w}" for w in word_list}
+    results = {'size': size, 'words': len(layout), 'styles': {}}
+    for style in crossword_html.STYLES:
+        render = lambda: crossword_html.render_crossword_html(grid, layout, clues, style)
+        current_html = render()
+        current = measure(render, repeat)
+        with legacy_renderer():
+            legacy_html = render()
+            legacy = measure(render, repeat)
+        results['styles'][style] = {
+            'current': current,
+            'legacy': legacy,
+            'peak_kb': peak_memory_kb(render),
+            'speedup': round(legacy['mean_ms'] / current['mean_ms'], 2) if current['mean_ms'] else None,
+            'identical': current_html == legacy_html,
+        }
+    return results
+
+def print_html_results(results: Dict):
+    print(f"HTML 渲染: {results['size']}x{results['size']} 网格, {results['words']} 个单词")
+    print(f"{'style':<10} {'legacy ms':>10} {'current ms':>11} {'speedup':>8}  identical")
+    for style, r in results['styles'].items():
+        print(f"{style:<10} {r['legacy']['mean_ms']:>10.3f} {r['current']['mean_ms']:>11.3f} "
+              f"{r['speedup']:>7}x  {r['identical']}")
+
+async def _api_load(app, requests: int, concurrency: int, words: int, seed: int) -> Dict:
+    import httpx
+    rng = random.Random(seed)
+    payloads = [{"words": random_words(words, rng), "use_llm": True} for _ in range(requests)]
+    samples, statuses = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(payload):
+            async with semaphore:
+                start = time.perf_counter()
+                # 跳过结果缓存，测量完整的生成 + LLM 路径
+                resp = await client.post("/api/crossword", json=payload,
+                                         headers={"Cache-Control": "no-cache"})
+                samples.append((time.perf_counter() - start) * 1000)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        # 预热进程池和连接池，使用单独的词表以免影响解释缓存
+        await one({"words": random_words(words, random.Random(seed - 1)), "use_llm": True})
+        samples.clear()
+        statuses.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in payloads))
+        elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'words': words,
+        'throughput_rps': round(requests / elapsed, 2),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        **percentiles(samples),
+    }
+
+def bench_api(requests: int, concurrency: int, words: int, llm_latency: float, seed: int) -> Dict:
+    """用模拟 LLM 接口测量 /api/crossword 的端到端吞吐和延迟"""
+    from llm_stub_server import start_stub_server
+    server, url = start_stub_server(0, latency=llm_latency)
+    # 必须在导入 api_server（及 llm_definition）之前设置
+    os.environ["DASHSCOPE_API_URL"] = url
+    os.environ.setdefault("CLUE_CACHE_PATH", "")
+    try:
+        import api_server
+        result = asyncio.run(_api_load(api_server.app, requests, concurrency, words, seed))
+    finally:
+        server.shutdown()
+    result['llm_latency_s'] = llm_latency
+    return result
+
+def print_api_results(r: Dict):
+    print(f"/api/crossword: {r['requests']} 个请求, 并发 {r['concurrency']}, 每个 {r['words']} 个单词, "
+          f"模拟 LLM 延迟 {r['llm_latency_s']}s")
+    print(f"吞吐 {r['throughput_rps']} req/s  mean {r['mean_ms']} ms  p50 {r['p50_ms']} ms  "
+          f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  状态码 {r['statuses']}")
+
+def _legacy_config_server():
+    """原来的配置服务器：单线程 TCPServer、HTTP/1.0、每次从磁盘读取 config.html 且不压缩"""
+    import socketserver
+    from config_server import ConfigHandler, CONFIG_HTML
+
+    class LegacyHandler(ConfigHandler):
+        protocol_version = 'HTTP/1.0'
+
+        def do_GET(self):
+            with open(CONFIG_HTML, 'rb') as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return socketserver.TCPServer(("127.0.0.1", 0), LegacyHandler)
+
+def _current_config_server():
+    from config_server import ConfigHandler, make_server
+
+    class QuietHandler(ConfigHandler):
+        def log_message(self, format, *args):
+            pass
+
+    return make_server(0, QuietHandler)
+
+def _serve_config(factory, port_queue):
+    """子进程中运行服务器，避免和压测客户端争用 GIL"""
+    server = factory()
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+def _config_load(factory, clients: int, requests: int, renders: int, render_body: bytes) -> Dict:
+    """在 renders 个线程持续请求 /api/generate-html 的同时，测量 clients 个客户端加载配置页的延迟"""
+    import http.client
+    import multiprocessing
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_config, args=(factory, port_queue), daemon=True)
+    process.start()
+    port = port_queue.get(timeout=30)
+    stop = threading.Event()
+    rendered = [0]
+
+    def render_loop():
+        while not stop.is_set():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            conn.request('POST', '/api/generate-html', body=render_body,
+                         headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+            conn.getresponse().read()
+            conn.close()
+            rendered[0] += 1
+
+    def client(n: int) -> List[float]:
+        samples, conn, etag = [], None, None
+        for i in range(n):
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            # 一半请求带上 If-None-Match，模拟浏览器刷新
+            headers = {'Accept-Encoding': 'gzip, br'}
+            if etag and i % 2:
+                headers['If-None-Match'] = etag
+            start = time.perf_counter()
+            conn.request('GET', '/', headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            samples.append((time.perf_counter() - start) * 1000)
+            etag = resp.getheader('ETag') or etag
+            if resp.will_close:
+                conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        return samples
+
+    workers = [threading.Thread(target=render_loop, daemon=True) for _ in range(renders)]
+    for w in workers:
+        w.start()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            samples = [s for chunk in pool.map(client, [requests // clients] * clients) for s in chunk]
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        for w in workers:
+            w.join()
+        process.terminate()
+        process.join()
+    return {'requests': len(samples), 'throughput_rps': round(len(samples) / elapsed, 2),
+            'renders': rendered[0], **percentiles(samples)}
+
+def bench_config(clients: int, requests: int, renders: int, size: int, words: int, seed: int) -> Dict:
+    """对比新旧配置服务器在并发渲染下加载配置页的延迟"""
+    rng = random.Random(seed)
+    word_list = random_words(words, rng)
+    grid, layout = generate_crossword(word_list, size, seed=seed, crop=False)
+    render_body = json.dumps({'grid': grid, 'layout': layout,
+                              'clues': {w: f"Clue for {w}" for w in word_list}}).encode('utf-8')
+    results = {'clients': clients, 'renders': renders, 'size': size}
+    for name, factory in (('legacy', _legacy_config_server), ('current', _current_config_server)):
+        results[name] = _config_load(factory, clients, requests, renders, render_body)
+    return results
+
+def print_config_results(results: Dict):
+    print(f"配置服务器: {results['clients']} 个客户端加载配置页, 同时 {results['renders']} 个线程渲染 "
+          f"{results['size']}x{results['size']} HTML")
+    for name in ('legacy', 'current'):
+        r = results[name]
+        print(f"{name:<8} {r['throughput_rps']:>8} req/s  mean {r['mean_ms']} ms  p50 {r['p50_ms']} ms  "
+              f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  期间完成渲染 {r['renders']} 次")
+
+def environment_info() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def _flatten(results: Dict) -> Dict[str, float]:
+    """把结果展开成 {指标路径: 平均耗时}，用于两次结果的对比"""
+    flat = {}
+    for r in results.get('generator', []):
+        flat[f"generator/{r['engine']}/{r['words']}w/{r['size']}"] = r['mean_ms']
+    html = results.get('html')
+    if html:
+        for style, r in html['styles'].items():
+            flat[f"html/{html['size']}/{style}"] = r['current']['mean_ms']
+    api = results.get('api')
+    if api:
+        flat['api/mean'] = api['mean_ms']
+        flat['api/p95'] = api['p95_ms']
+    config = results.get('config')
+    if config:
+        flat['config/p50'] = config['current']['p50_ms']
+        flat['config/p95'] = config['current']['p95_ms']
+    return flat
+
+def compare_results(old_path: str, new_path: str, threshold: float = 0.1):
+    """对比两个结果文件，变慢超过 threshold 的指标标记为回归"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    old_flat, new_flat = _flatten(old), _flatten(new)
+    print(f"{old.get('env', {}).get('commit')} -> {new.get('env', {}).get('commit')}")
+    regressions = 0
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- 回归'
+            regressions += 1
+        print(f"{key:<40} {before:>10.3f} {after:>10.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+def write_json(path: Optional[str], results: Dict):
+    if not path:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='填字游戏性能基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    generator = sub.add_parser('generator', help='不同单词数和网格尺寸下的生成性能')
+    generator.add_argument('--engine', choices=['greedy', 'search'], default='greedy')
+
+    html = sub.add_parser('html', help='对比新旧 HTML 渲染路径')
+    html.add_argument('--size', type=int, default=30)
+    html.add_argument('--words', type=int, default=200)
+
+    api = sub.add_parser('api', help='/api/crossword 端到端吞吐（模拟 LLM）')
+    all_ = sub.add_parser('all', help='运行全部基准')
+    for p in (api, all_):
+        p.add_argument('--requests', type=int, default=100)
+        p.add_argument('--concurrency', type=int, default=16)
+        p.add_argument('--api-words', type=int, default=15)
+        p.add_argument('--llm-latency', type=float, default=0.05, help='模拟 LLM 每次调用的延迟（秒）')
+
+    config = sub.add_parser('config', help='配置服务器在并发渲染下加载页面的延迟（新旧对比）')
+    for p in (config, all_):
+        p.add_argument('--clients', type=int, default=8)
+        p.add_argument('--config-requests', type=int, default=400)
+        p.add_argument('--renders', type=int, default=4, help='同时持续渲染 HTML 的线程数')
+
+    for p in (generator, html, api, config, all_):
+        p.add_argument('--repeat', type=int, default=20)
+        p.add_argument('--seed', type=int, default=1)
+        p.add_argument('--output', help='把结果保存为 JSON，便于在提交之间对比')
+
+    compare = sub.add_parser('compare', help='对比两次保存的结果')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.1, help='视为回归的变慢比例')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        raise SystemExit(1 if compare_results(args.old, args.new, args.threshold) else 0)
+
+    results = {'env': environment_info()}
+    if args.command in ('generator', 'all'):
+        results['generator'] = bench_generator(GENERATOR_CASES, args.repeat, args.seed,
+                                               getattr(args, 'engine', 'greedy'))
+        print_generator_results(results['generator'])
+    if args.command in ('html', 'all'):
+        results['html'] = bench_html(getattr(args, 'size', 30), getattr(args, 'words', 200),
+                                     args.repeat, args.seed)
+        print_html_results(results['html'])
+    if args.command in ('api', 'all'):
+        results['api'] = bench_api(args.requests, args.concurrency, args.api_words,
+                                   args.llm_latency, args.seed)
+        print_api_results(results['api'])
+    if args.command in ('config', 'all'):
+        results['config'] = bench_config(args.clients, args.config_requests, args.renders,
+                                         getattr(args, 'size', 30), getattr(args, 'words', 200), args.seed)
+        print_config_results(results['config'])
+    write_json(args.output, results)
+
+if __name__ == '__main__':
+    main()
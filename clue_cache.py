@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+
+CLUE_CACHE_PATH = os.getenv("CLUE_CACHE_PATH", os.path.join(".cache", "clues.sqlite3"))
+CLUE_CACHE_TTL = float(os.getenv("CLUE_CACHE_TTL", 30 * 24 * 3600))
+CLUE_CACHE_MEMORY_SIZE = int(os.getenv("CLUE_CACHE_MEMORY_SIZE", 4096))
+CLUE_CACHE_MAX_ENTRIES = int(os.getenv("CLUE_CACHE_MAX_ENTRIES", 100000))
+
+_MISSING = object()
+
+class TTLCache:
+    """线程安全的内存 LRU 缓存，支持条目过期"""
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def normalize_word(word: str) -> str:
+    return word.strip().lower()
+
+class ClueCache:
+    """单词解释缓存：内存 LRU + SQLite 持久化
+
+    缓存键为 (规范化单词, 模型名, 提示词版本)，任一变化都会视为未命中。
+    path 为空时只使用内存缓存。
+    """
+    def __init__(self, path: Optional[str] = CLUE_CACHE_PATH, ttl: Optional[float] = CLUE_CACHE_TTL,
+                 memory_size: int = CLUE_CACHE_MEMORY_SIZE, max_entries: int = CLUE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = TTLCache(memory_size, ttl)
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS clues ("
+                " key TEXT PRIMARY KEY, definition TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS clues_accessed ON clues (accessed_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(word: str, model: str, prompt_version: str) -> str:
+        return f"{prompt_version}\x1f{model}\x1f{normalize_word(word)}"
+
+    def get_many(self, words: Iterable[str], model: str, prompt_version: str) -> Dict[str, str]:
+        """返回命中缓存的 {word: definition}，未命中的单词不出现在结果中"""
+        found: Dict[str, str] = {}
+        disk_keys: Dict[str, str] = {}
+        total = 0
+        for word in words:
+            total += 1
+            key = self.make_key(word, model, prompt_version)
+            value = self.memory.get(key)
+            if value is not None:
+                found[word] = value
+            else:
+                disk_keys[key] = word
+        memory_hits = len(found)
+
+        if disk_keys and self._conn is not None:
+            now = time.time()
+            keys = list(disk_keys)
+            with self._lock:
+                rows = []
+                # 分段查询，避免超过 SQLite 的参数个数限制
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(self._conn.execute(
+                        f"SELECT key, definition, created_at FROM clues WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall())
+                fresh, expired = [], []
+                for key, definition, created_at in rows:
+                    if self.ttl and created_at + self.ttl <= now:
+                        expired.append((key,))
+                    else:
+                        fresh.append((key, definition))
+                if expired:
+                    self._conn.executemany("DELETE FROM clues WHERE key = ?", expired)
+                if fresh:
+                    self._conn.executemany("UPDATE clues SET accessed_at = ? WHERE key = ?",
+                                           [(now, key) for key, _ in fresh])
+                if expired or fresh:
+                    self._conn.commit()
+            for key, definition in fresh:
+                found[disk_keys[key]] = definition
+                self.memory.set(key, definition)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += total - len(found)
+            self.memory_hits += memory_hits
+            self.disk_hits += len(found) - memory_hits
+        return found
+
+    def set_many(self, definitions: Dict[str, str], model: str, prompt_version: str):
+        if not definitions:
+            return
+        now = time.time()
+        rows = []
+        for word, definition in definitions.items():
+            key = self.make_key(word, model, prompt_version)
+            self.memory.set(key, definition)
+            rows.append((key, definition, now, now))
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO clues (key, definition, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            # 超出容量时按最近访问时间淘汰
+            count = self._conn.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM clues WHERE key IN ("
+                    " SELECT key FROM clues ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        self.memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM clues")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        disk_size = 0
+        if self._conn is not None:
+            with self._lock:
+                disk_size = self._conn.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "memory_size": len(self.memory),
+            "disk_size": disk_size,
+        }
+
+_clue_cache: Optional[ClueCache] = None
+_clue_cache_lock = threading.Lock()
+
+def get_clue_cache() -> ClueCache:
+    """返回进程内共享的解释缓存"""
+    global _clue_cache
+    if _clue_cache is None:
+        with _clue_cache_lock:
+            if _clue_cache is None:
+                _clue_cache = ClueCache()
+    return _clue_cache
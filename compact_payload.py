@@ -0,0 +1,61 @@
+"""
+/api/crossword 的紧凑响应格式，供小程序等移动端使用
+
+网格可以由布局完全重建，因此只传布局。每个单词的位置和方向压缩成一个整数
+(row * cols + col) * 2 + 方向（0 横向，1 纵向），提示按布局顺序排列：
+
+    {"v": 2, "r": 行数, "c": 列数, "w": ["APPLE", "ICE CREAM", ...], "p": [位置...],
+     "k": [提示...], "u": [未放置的单词...], "s": 种子}
+
+单词可能包含空格（如 "ice cream"），因此 w 是数组。解码时遇到未知的版本号直接报错。
+
+解码见 decode_compact 和 miniprogram/utils/compact.js。
+"""
+import json
+from typing import Dict, List, Optional
+
+COMPACT_VERSION = 2
+COMPACT_MEDIA_TYPE = "application/vnd.crossword.compact+json"
+
+def wants_compact(format_param: Optional[str], accept: Optional[str]) -> bool:
+    """按查询参数 format=compact 或 Accept 头判断客户端是否需要紧凑格式"""
+    if format_param:
+        return format_param.lower() == "compact"
+    return bool(accept) and COMPACT_MEDIA_TYPE in accept
+
+def encode_compact(result: Dict) -> Dict:
+    grid, layout, clues = result["grid"], result["layout"], result.get("clues") or {}
+    cols = len(grid[0]) if grid else 0
+    by_word = {w.upper(): clue for w, clue in clues.items()}
+    return {
+        "v": COMPACT_VERSION,
+        "r": len(grid),
+        "c": cols,
+        "w": [e["word"] for e in layout],
+        "p": [(e["row"] * cols + e["col"]) * 2 + (e["direction"] == "down") for e in layout],
+        "k": [by_word.get(e["word"], "") for e in layout],
+        "u": result.get("unplaced", []),
+        "s": result.get("seed"),
+    }
+
+def dumps_compact(result: Dict) -> bytes:
+    return json.dumps(encode_compact(result), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def decode_compact(payload: Dict) -> Dict:
+    """还原为 grid / layout / clues（提示以小写单词为键），版本不是 COMPACT_VERSION 时抛出 ValueError"""
+    if payload.get("v") != COMPACT_VERSION:
+        raise ValueError(f"不支持的紧凑格式版本: {payload.get('v')!r}")
+    rows, cols = payload["r"], payload["c"]
+    words: List[str] = payload["w"]
+    grid = [[""] * cols for _ in range(rows)]
+    layout, clues = [], {}
+    for word, packed, clue in zip(words, payload["p"], payload["k"]):
+        pos, down = divmod(packed, 2)
+        row, col = divmod(pos, cols)
+        direction = "down" if down else "across"
+        layout.append({"word": word, "row": row, "col": col, "direction": direction})
+        for i, ch in enumerate(word):
+            grid[row + i * down][col + i * (1 - down)] = ch
+        clues[word.lower()] = clue
+    return {"grid": grid, "layout": layout, "clues": clues, "unplaced": payload.get("u", []),
+            "seed": payload.get("s")}
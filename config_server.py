@@ -3,31 +3,98 @@
 简单的HTTP服务器用于提供配置界面
 """
 import http.server
-import socketserver
-import os
 import json
-from urllib.parse import urlparse, parse_qs
+import os
 import threading
 import webbrowser
+from typing import Dict, Optional
+
+from response_utils import make_etag, etag_matches, encode_body, choose_encoding, precompress
 
 PORT = 3000
+CONFIG_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.html')
+# 配置界面可能随时更新，让浏览器每次用 ETag 验证（命中时只返回 304）
+CONFIG_CACHE_CONTROL = os.getenv('CONFIG_CACHE_CONTROL', 'no-cache')
+
+class StaticAsset:
+    """常驻内存的静态文件，预先计算 ETag 和各压缩版本；文件修改后自动重新加载"""
+    def __init__(self, path: str, content_type: str):
+        self.path = path
+        self.content_type = content_type
+        self.mtime: Optional[float] = None
+        self.etag = ''
+        self.variants: Dict[Optional[str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        mtime = os.stat(self.path).st_mtime
+        if mtime == self.mtime:
+            return
+        with self._lock:
+            if mtime == self.mtime:
+                return
+            with open(self.path, 'rb') as f:
+                body = f.read()
+            self.etag = make_etag(body)
+            self.variants = precompress(body)
+            self.mtime = mtime
+
+    def select(self, accept_encoding: Optional[str]):
+        """返回 (body, Content-Encoding)"""
+        self.refresh()
+        encoding = choose_encoding(accept_encoding)
+        if encoding not in self.variants:
+            encoding = None
+        return self.variants[encoding], encoding
+
+config_page = StaticAsset(CONFIG_HTML, 'text/html; charset=utf-8')
 
 class ConfigHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 长连接：浏览器可以在同一连接上连续请求
+    protocol_version = 'HTTP/1.1'
+
     def do_GET(self):
         # 处理根路径，返回配置界面
-        if self.path == '/' or self.path == '/config':
-            self.path = '/config.html'
-        
+        if self.path in ('/', '/config', '/config.html'):
+            self.send_asset(config_page)
+            return
+
         # 调用父类的GET处理方法
         return super().do_GET()
-    
+
+    def do_OPTIONS(self):
+        # CORS 预检请求
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
     def do_POST(self):
         # 处理配置相关的POST请求
         if self.path == '/api/generate-html':
             self.handle_generate_html()
         else:
             self.send_error(404, "Not Found")
-    
+
+    def send_asset(self, asset: StaticAsset):
+        """发送内存中的静态文件，支持 If-None-Match 和预压缩版本"""
+        body, encoding = asset.select(self.headers.get('Accept-Encoding'))
+        if etag_matches(self.headers.get('If-None-Match'), asset.etag):
+            self.send_response(304)
+            self.send_header('ETag', asset.etag)
+            self.send_header('Cache-Control', CONFIG_CACHE_CONTROL)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', asset.etag)
+        self.send_header('Cache-Control', CONFIG_CACHE_CONTROL)
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
     def handle_generate_html(self):
         """处理HTML生成请求"""
         try:
@@ -35,43 +102,41 @@ class ConfigHandler(http.server.SimpleHTTPRequestHandler):
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
-            
+
             # 导入必要的模块
-            from crossword_html import generate_crossword_html
-            import tempfile
-            
+            from crossword_html import render_crossword_html
+
             # 提取参数
             grid = data.get('grid')
             layout = data.get('layout')
             clues = data.get('clues')
             style = data.get('style', 'classic')
-            
+
             if not all([grid, layout, clues]):
                 self.send_error(400, "Missing required data")
                 return
-            
-            # 生成HTML文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
-                generate_crossword_html(grid, layout, clues, f.name, style)
-                html_file = f.name
-            
-            # 读取生成的HTML内容
-            with open(html_file, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            
-            # 清理临时文件
-            os.unlink(html_file)
-            
+
+            # 在内存中生成HTML
+            html_bytes = render_crossword_html(grid, layout, clues, style).encode('utf-8')
+            # POST 不能返回 304（RFC 9110），只附带 ETag 供客户端比较
+            etag = make_etag(html_bytes)
+
             # 返回HTML内容
+            body, encoding = encode_body(html_bytes, self.headers.get('Accept-Encoding'))
             self.send_response(200)
             self.send_header('Content-type', 'text/html; charset=utf-8')
             self.send_header('Content-Disposition', f'attachment; filename="crossword-{style}.html"')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
             self.end_headers()
-            self.wfile.write(html_content.encode('utf-8'))
-            
+            self.wfile.write(body)
+
         except Exception as e:
             self.send_error(500, f"Internal Server Error: {str(e)}")
-    
+
     def end_headers(self):
         # 添加CORS头部
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -79,23 +144,33 @@ class ConfigHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
 
+class ConfigHTTPServer(http.server.ThreadingHTTPServer):
+    """每个连接一个线程，渲染中的请求不会阻塞其他浏览器加载页面"""
+    daemon_threads = True
+    # 默认监听队列只有 5，并发连接稍多就会触发 1 秒的 SYN 重传
+    request_queue_size = 64
+
+def make_server(port: int = PORT, handler=ConfigHandler) -> ConfigHTTPServer:
+    return ConfigHTTPServer(("", port), handler)
+
 def run_server():
     """运行配置服务器"""
-    with socketserver.TCPServer(("", PORT), ConfigHandler) as httpd:
+    config_page.refresh()
+    with make_server(PORT) as httpd:
         print(f"配置界面服务器运行在 http://localhost:{PORT}")
         print("按 Ctrl+C 停止服务器")
-        
+
         # 自动打开浏览器
         def open_browser():
             webbrowser.open(f'http://localhost:{PORT}')
-        
+
         timer = threading.Timer(1.0, open_browser)
         timer.start()
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n服务器已停止")
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    run_server()
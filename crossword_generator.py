@@ -1,97 +1,567 @@
+import math
+import os
 import random
-from typing import List, Tuple, Dict
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple, Dict, Optional
 
-class CrosswordCell:
-    def __init__(self):
-        self.char = ''
-        self.is_black = False
+GENERATOR_WORKERS = int(os.getenv("GENERATOR_WORKERS", os.cpu_count() or 1))
+# 自动尺寸时网格的上下限
+MIN_GRID_SIZE = 5
+MAX_GRID_SIZE = int(os.getenv("MAX_GRID_SIZE", 60))
+# search 引擎默认的时间预算（秒）
+SEARCH_TIME_BUDGET = 0.2
+
+ENGINES = ('greedy', 'search')
+# 生成算法或输出格式变化时递增，使已缓存的结果失效
+GENERATOR_VERSION = "4"
+
+ACROSS, DOWN = 1, 2
+DIRECTION_BITS = {'across': ACROSS, 'down': DOWN}
+
+# 字节翻译表：非零字节 -> 0xFF / 零字节 -> 0xFF，用于整段构造掩码
+_NONZERO_MASK = bytes([0] + [0xFF] * 255)
+_ZERO_MASK = bytes([0xFF] + [0] * 255)
+
+def _fits(segment: bytes, word_int: int) -> bool:
+    """segment 中已有字母的位置必须与单词相同（按整段整数比较，避免逐格循环）
+
+    word_int 为单词字节串的大端整数表示。
+    """
+    if segment.count(0) == len(segment):
+        return True
+    mask = int.from_bytes(segment.translate(_NONZERO_MASK), 'big')
+    return word_int & mask == int.from_bytes(segment, 'big')
 
 class Crossword:
-    def __init__(self, words: List[str], size: int = 12):
-        self.words = [w.upper() for w in words]
+    def __init__(self, words: List[str], size: int = 12, rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+        self.words = []
+        self.unplaced_words = []
+        # 无论网格多大都放不下的单词（无法按单字节编码）
+        self.invalid_words = []
+        for w in words:
+            # 空白单词没有可放置的字母，前后空格也不属于单词
+            w = w.strip().upper()
+            if not w:
+                continue
+            try:
+                w.encode('latin-1')
+            except UnicodeEncodeError:
+                # 网格按单字节存储字母，无法编码的单词直接记为未放置
+                self.invalid_words.append(w)
+            else:
+                self.words.append(w)
+        self.unplaced_words.extend(self.invalid_words)
         self.size = size
-        self.grid = [[CrosswordCell() for _ in range(size)] for _ in range(size)]
+        self._encoded: Dict[str, Tuple[bytes, int]] = {}
+        # 紧凑网格：cells 每格一个字节（0 表示空），dirs 记录占用该格的单词方向位
+        self.cells = bytearray(size * size)
+        self.dirs = bytearray(size * size)
         self.placed_words = []  # (word, row, col, direction)
+        # 字母字节 -> {格子下标: 方向位}，只记录仅被一个单词占用、还可以被交叉的格子
+        self.letter_index: Dict[int, Dict[int, int]] = {}
+        # 已放置单词的包围盒 (min_row, min_col, max_row, max_col)，及其历史（用于撤销）
+        self.bounds: Optional[Tuple[int, int, int, int]] = None
+        self._bounds_history = []
+
+    def _encode(self, word) -> Tuple[bytes, int]:
+        encoded = self._encoded.get(word)
+        if encoded is None:
+            data = word.encode('latin-1')
+            encoded = self._encoded[word] = (data, int.from_bytes(data, 'big'))
+        return encoded
+
+    def _span(self, row, col, direction, length) -> slice:
+        """单词在扁平网格中对应的切片，纵向单词以 size 为步长"""
+        start = row * self.size + col
+        if direction == 'across':
+            return slice(start, start + length, 1)
+        return slice(start, start + (length - 1) * self.size + 1, self.size)
 
     def can_place(self, word, row, col, direction):
         if direction == 'across':
             if col + len(word) > self.size:
                 return False
-            for i, c in enumerate(word):
-                cell = self.grid[row][col + i]
-                if cell.char not in ('', c):
-                    return False
         else:
             if row + len(word) > self.size:
                 return False
-            for i, c in enumerate(word):
-                cell = self.grid[row + i][col]
-                if cell.char not in ('', c):
-                    return False
-        return True
-
-    def place_word(self, word, row, col, direction):
+        start = row * self.size + col
         if direction == 'across':
-            for i, c in enumerate(word):
-                self.grid[row][col + i].char = c
+            segment = self.cells[start:start + len(word)]
         else:
-            for i, c in enumerate(word):
-                self.grid[row + i][col].char = c
+            segment = self.cells[start:start + (len(word) - 1) * self.size + 1:self.size]
+        if segment.count(0) == len(word):
+            return True
+        mask = int.from_bytes(segment.translate(_NONZERO_MASK), 'big')
+        return self._encode(word)[1] & mask == int.from_bytes(segment, 'big')
+
+    def place_word(self, word, row, col, direction):
+        """放置单词，返回本次新填入字母的格子下标（用于回溯撤销）"""
+        end_r = row + (len(word) - 1 if direction == 'down' else 0)
+        end_c = col + (len(word) - 1 if direction == 'across' else 0)
+        if row < 0 or col < 0 or end_r >= self.size or end_c >= self.size:
+            raise ValueError(f"单词 {word} 超出网格范围")
+        bit = DIRECTION_BITS[direction]
+        other = (ACROSS | DOWN) ^ bit
+        span = self._span(row, col, direction, len(word))
+        new_cells = []
+        for pos, b in zip(range(span.start, span.stop, span.step), self._encode(word)[0]):
+            if not self.cells[pos]:
+                new_cells.append(pos)
+                self.cells[pos] = b
+                self.letter_index.setdefault(b, {})[pos] = bit
+            elif self.dirs[pos] & other:
+                # 格子已被交叉，不能再作为交叉候选
+                self.letter_index[b].pop(pos, None)
+            self.dirs[pos] |= bit
         self.placed_words.append((word, row, col, direction))
+        self._bounds_history.append(self.bounds)
+        self.bounds = self._extend_bounds(self.bounds, word, row, col, direction)
+        return new_cells
+
+    def remove_last_word(self, new_cells):
+        """撤销最近一次 place_word"""
+        word, row, col, direction = self.placed_words.pop()
+        bit = DIRECTION_BITS[direction]
+        other = (ACROSS | DOWN) ^ bit
+        span = self._span(row, col, direction, len(word))
+        for pos in range(span.start, span.stop, span.step):
+            self.dirs[pos] &= other
+            if self.dirs[pos] == other:
+                self.letter_index[self.cells[pos]][pos] = other
+        for pos in new_cells:
+            self.letter_index[self.cells[pos]].pop(pos, None)
+            self.cells[pos] = 0
+        self.bounds = self._bounds_history.pop()
+
+    @staticmethod
+    def _extend_bounds(bounds, word, row, col, direction):
+        end_r = row + (len(word) - 1 if direction == 'down' else 0)
+        end_c = col + (len(word) - 1 if direction == 'across' else 0)
+        if bounds is None:
+            return row, col, end_r, end_c
+        min_r, min_c, max_r, max_c = bounds
+        return min(min_r, row), min(min_c, col), max(max_r, end_r), max(max_c, end_c)
+
+    def crossing_starts(self, word):
+        """从字母索引中列出与已放置单词交叉的起点 (row, col, direction)，不做合法性检查"""
+        seen = set()
+        for j, b in enumerate(self._encode(word)[0]):
+            for pos, pd in self.letter_index.get(b, {}).items():
+                r, c = divmod(pos, self.size)
+                if pd == ACROSS:
+                    key = (r - j, c, 'down')
+                else:
+                    key = (r, c - j, 'across')
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def check_placement(self, word, row, col, direction) -> int:
+        """严格检查放置是否合法：不越界、不与同向单词重叠、不与相邻单词粘连
+
+        合法时返回交叉格数，否则返回 -1。
+        """
+        size = self.size
+        length = len(word)
+        across = direction == 'across'
+        end_r = row + (0 if across else length - 1)
+        end_c = col + (length - 1 if across else 0)
+        if row < 0 or col < 0 or end_r >= size or end_c >= size:
+            return -1
+        span = self._span(row, col, direction, length)
+        segment = self.cells[span]
+        if not _fits(segment, self._encode(word)[1]):
+            return -1
+        crossings = length - segment.count(0)
+        if crossings == length:
+            return -1
+        if crossings:
+            bit = DIRECTION_BITS[direction]
+            directions = self.dirs[span]
+            if bit in directions or (ACROSS | DOWN) in directions:
+                return -1
+        # 单词首尾之外的格子必须为空
+        step = span.step
+        if (row > 0 if not across else col > 0) and self.cells[span.start - step]:
+            return -1
+        if (end_r < size - 1 if not across else end_c < size - 1) and self.cells[span.start + length * step]:
+            return -1
+        # 新填的格子两侧不能有字母，否则会拼出无意义的单词
+        empty_mask = int.from_bytes(segment.translate(_ZERO_MASK), 'big')
+        offset = size if across else 1
+        for has_side, shift in (((row if across else col) > 0, -offset),
+                                ((row if across else col) < size - 1, offset)):
+            if has_side:
+                neighbours = self.cells[span.start + shift:span.stop + shift:span.step]
+                if int.from_bytes(neighbours, 'big') & empty_mask:
+                    return -1
+        return crossings
+
+    def bounding_box(self, extra=None) -> Optional[Tuple[int, int, int, int]]:
+        """返回已放置单词（及可选的待放置单词）的 (min_row, min_col, max_row, max_col)"""
+        if extra:
+            return self._extend_bounds(self.bounds, *extra)
+        return self.bounds
+
+    def candidate_placements(self, word) -> List[Tuple[Tuple[int, int], int, int, str]]:
+        """列出单词所有合法的交叉放置，按 (交叉数多, 包围盒面积小) 排序
+
+        返回 [(score, row, col, direction)]，score 越大越好。
+        """
+        candidates = []
+        for row, col, direction in self.crossing_starts(word):
+            crossings = self.check_placement(word, row, col, direction)
+            if crossings > 0:
+                min_r, min_c, max_r, max_c = self.bounding_box((word, row, col, direction))
+                area = (max_r - min_r + 1) * (max_c - min_c + 1)
+                candidates.append(((crossings, -area), row, col, direction))
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        return candidates
+
+    def isolated_placements(self, word, limit: int = 4) -> List[Tuple[Tuple[int, int], int, int, str]]:
+        """没有交叉位置时，列出不与其他单词接触的放置，按包围盒面积排序"""
+        candidates = []
+        for direction in ('across', 'down'):
+            for row in range(self.size):
+                for col in range(self.size):
+                    if self.check_placement(word, row, col, direction) == 0:
+                        min_r, min_c, max_r, max_c = self.bounding_box((word, row, col, direction))
+                        area = (max_r - min_r + 1) * (max_c - min_c + 1)
+                        candidates.append(((0, -area), row, col, direction))
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        return candidates[:limit]
 
     def generate(self):
         # 简单策略：第一个单词横向放在中间，后续尽量交叉
-        self.place_word(self.words[0], self.size // 2, (self.size - len(self.words[0])) // 2, 'across')
-        for word in self.words[1:]:
+        words = [w for w in self.words if len(w) <= self.size]
+        self.unplaced_words.extend(w for w in self.words if len(w) > self.size)
+        if not words:
+            return
+        self.place_word(words[0], self.size // 2, (self.size - len(words[0])) // 2, 'across')
+        for word in words[1:]:
             placed = False
-            for pw, prow, pcol, pd in self.placed_words:
-                for i, pc in enumerate(pw):
-                    for j, wc in enumerate(word):
-                        if pc == wc:
-                            if pd == 'across':
-                                row = prow - j
-                                col = pcol + i
-                                if 0 <= row < self.size and 0 <= col < self.size:
-                                    if self.can_place(word, row, col, 'down'):
-                                        self.place_word(word, row, col, 'down')
-                                        placed = True
-                                        break
-                            else:
-                                row = prow + i
-                                col = pcol - j
-                                if 0 <= row < self.size and 0 <= col < self.size:
-                                    if self.can_place(word, row, col, 'across'):
-                                        self.place_word(word, row, col, 'across')
-                                        placed = True
-                                        break
-                    if placed:
+            for row, col, direction in self.crossing_starts(word):
+                if 0 <= row < self.size and 0 <= col < self.size:
+                    if self.can_place(word, row, col, direction):
+                        self.place_word(word, row, col, direction)
+                        placed = True
                         break
-                if placed:
-                    break
             if not placed:
                 # 随机找个能放的位置
                 for _ in range(100):
-                    direction = random.choice(['across', 'down'])
-                    row = random.randint(0, self.size - 1)
-                    col = random.randint(0, self.size - 1)
+                    direction = self.rng.choice(['across', 'down'])
+                    row = self.rng.randint(0, self.size - 1)
+                    col = self.rng.randint(0, self.size - 1)
                     if self.can_place(word, row, col, direction):
                         self.place_word(word, row, col, direction)
                         break
+                else:
+                    self.unplaced_words.append(word)
+
+    def generate_search(self, time_budget: float = SEARCH_TIME_BUDGET, node_budget: int = 2000, beam: int = 4):
+        """按评分回溯搜索放置方案
 
-    def to_grid(self) -> List[List[str]]:
-        return [[cell.char if cell.char else '' for cell in row] for row in self.grid]
+        单词按长度从长到短依次放置，每个单词只尝试评分最高的 beam 个位置，
+        也允许跳过。搜索在找到全部放置的方案、超出时间预算（秒）或节点预算时停止，
+        最终采用 (放置数, 交叉数, -包围盒面积) 最优的方案，放不下的单词记录在 unplaced_words。
+        """
+        words = sorted(self.words, key=len, reverse=True)
+        fitting = [w for w in words if len(w) <= self.size]
+        too_long = [w for w in words if len(w) > self.size]
+        deadline = time.perf_counter() + time_budget
+        nodes = 0
+        best = {'score': None, 'placed': []}
 
-    def get_layout(self) -> List[Dict]:
-        # 返回每个单词的布局信息
+        def record(crossings):
+            if self.placed_words:
+                min_r, min_c, max_r, max_c = self.bounding_box()
+                area = (max_r - min_r + 1) * (max_c - min_c + 1)
+            else:
+                area = 0
+            score = (len(self.placed_words), crossings, -area)
+            if best['score'] is None or score > best['score']:
+                best['score'] = score
+                best['placed'] = list(self.placed_words)
+
+        def search(index, crossings):
+            nonlocal nodes
+            nodes += 1
+            if index == len(fitting):
+                record(crossings)
+                # 全部放上且彼此连通（至少 n-1 个交叉）即可提前结束
+                return len(self.placed_words) == len(fitting) and crossings >= len(fitting) - 1
+            if nodes > node_budget or time.perf_counter() > deadline:
+                record(crossings)
+                return True
+            # 剪枝：剩余单词全部放上也无法超过当前最优
+            if best['score'] is not None and \
+                    len(self.placed_words) + len(fitting) - index < best['score'][0]:
+                return False
+            word = fitting[index]
+            if not self.placed_words:
+                candidates = [((0, 0), self.size // 2, (self.size - len(word)) // 2, 'across')]
+            else:
+                candidates = self.candidate_placements(word)[:beam] or self.isolated_placements(word)
+            for (gained, _), row, col, direction in candidates:
+                new_cells = self.place_word(word, row, col, direction)
+                stop = search(index + 1, crossings + gained)
+                self.remove_last_word(new_cells)
+                if stop:
+                    return True
+            return search(index + 1, crossings)
+
+        search(0, 0)
+        for word, row, col, direction in best['placed']:
+            self.place_word(word, row, col, direction)
+        placed = {w for w, _, _, _ in best['placed']}
+        self.unplaced_words += [w for w in fitting if w not in placed] + too_long
+
+    def rows(self) -> List[str]:
+        """按行导出网格字符串，空格子为 '\\x00'"""
+        text = self.cells.decode('latin-1')
+        return [text[r * self.size:(r + 1) * self.size] for r in range(self.size)]
+
+    def to_grid(self, crop: bool = False) -> List[List[str]]:
+        """导出网格；crop 为 True 时裁剪到已放置单词的包围盒"""
+        rows = self.rows()
+        if crop:
+            if self.bounds is None:
+                return []
+            min_r, min_c, max_r, max_c = self.bounds
+            rows = [row[min_c:max_c + 1] for row in rows[min_r:max_r + 1]]
+        return [['' if ch == '\x00' else ch for ch in row] for row in rows]
+
+    def get_layout(self, crop: bool = False) -> List[Dict]:
+        # 返回每个单词的布局信息，裁剪时坐标相对包围盒左上角
+        dr, dc = self.bounds[:2] if crop and self.bounds else (0, 0)
         return [
-            {'word': w, 'row': r, 'col': c, 'direction': d}
+            {'word': w, 'row': r - dr, 'col': c - dc, 'direction': d}
             for w, r, c, d in self.placed_words
         ]
 
-def generate_crossword(words: List[str], size: int = 12):
-    cw = Crossword(words, size)
-    cw.generate()
-    return cw.to_grid(), cw.get_layout()
+def auto_grid_size(words: List[str]) -> int:
+    """根据单词数量和长度估算初始网格边长"""
+    lengths = [len(w.strip()) for w in words if w.strip()]
+    if not lengths:
+        return MIN_GRID_SIZE
+    # 稀疏填字游戏的字母密度大约在 40% 左右
+    estimate = math.ceil(math.sqrt(sum(lengths) * 2.5))
+    return max(MIN_GRID_SIZE, min(MAX_GRID_SIZE, max(max(lengths), estimate)))
+
+def grid_size_steps(size: int) -> List[int]:
+    """自动尺寸时依次尝试的网格边长：每次扩大约 1/4，直到 MAX_GRID_SIZE"""
+    sizes = [size]
+    while size < MAX_GRID_SIZE:
+        size = min(MAX_GRID_SIZE, size + max(2, size // 4))
+        sizes.append(size)
+    return sizes
+
+def generate_crossword(words: List[str], size: Optional[int] = None, engine: str = 'greedy',
+                       time_budget: Optional[float] = None, node_budget: Optional[int] = None,
+                       seed: Optional[int] = None, crop: bool = True):
+    """生成填字游戏，返回 (grid, layout)
+
+    engine 为 'greedy' 时使用原有的贪心放置；为 'search' 时使用评分回溯搜索，
+    time_budget（秒）和 node_budget 控制搜索耗时与质量的权衡。
+    指定 seed 时随机回退放置可复现。
+    size 为 None 时根据单词估算初始尺寸，有单词放不下时逐步扩大网格（不超过 MAX_GRID_SIZE），
+    search 引擎只在贪心能放下全部单词的尺寸上搜索一次，搜索耗时不超过一次的预算；
+    指定 size 时使用固定尺寸。crop 为 True 时结果裁剪到单词的包围盒，网格可能不是正方形。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的生成引擎: {engine}")
+    sizes = grid_size_steps(auto_grid_size(words)) if size is None else [size]
+    probe = None
+    if engine == 'search' and len(sizes) > 1:
+        # 每个尺寸都完整搜索一次会使耗时成倍超出预算：先用贪心快速找到能放下全部单词的尺寸，
+        # 只在该尺寸上用完整预算搜索
+        for size in sizes:
+            probe = Crossword(words, size, random.Random(seed))
+            probe.generate()
+            if len(probe.unplaced_words) <= len(probe.invalid_words):
+                break
+        sizes = [size]
+    for size in sizes:
+        cw = Crossword(words, size, random.Random(seed))
+        if engine == 'search':
+            budgets = {}
+            if time_budget is not None:
+                budgets['time_budget'] = time_budget
+            if node_budget is not None:
+                budgets['node_budget'] = node_budget
+            cw.generate_search(**budgets)
+        else:
+            cw.generate()
+        if len(cw.unplaced_words) <= len(cw.invalid_words):
+            break
+    if probe is not None and len(probe.placed_words) > len(cw.placed_words):
+        # 预算内的搜索放下的单词比贪心少时，使用贪心的结果
+        cw = probe
+    return cw.to_grid(crop), cw.get_layout(crop)
+
+def edit_crossword(layout: List[Dict], add: List[str] = (), remove: List[str] = ()):
+    """在已有布局上增删单词，保留其余单词的位置，只为新增单词寻找位置
+
+    返回 (grid, layout, diff)，grid/layout 为裁剪后的完整结果，diff 供前端增量更新：
+      removed  被删除的单词
+      offset   保留的单词坐标需要加上的偏移 {'row', 'col'}（网格扩展或收缩后左上角会移动）
+      added    新放置单词的布局（新坐标）
+      unplaced 放不下的新增单词
+      rows/cols 新网格尺寸
+    """
+    remove_set = {w.strip().upper() for w in remove}
+    kept = [e for e in layout if e['word'] not in remove_set]
+    removed = [e['word'] for e in layout if e['word'] in remove_set]
+    existing = {e['word'] for e in kept}
+    new_words = []
+    for w in add:
+        w = w.strip().upper()
+        if w and w not in existing and w not in new_words:
+            new_words.append(w)
+
+    # 在原布局四周留出新单词长度的空白，使新单词可以向任意方向伸出
+    height = max((e['row'] + (len(e['word']) if e['direction'] == 'down' else 1) for e in kept), default=0)
+    width = max((e['col'] + (len(e['word']) if e['direction'] == 'across' else 1) for e in kept), default=0)
+    extent = max(height, width)
+    if extent > MAX_GRID_SIZE:
+        raise ValueError(f"布局超出网格上限 {MAX_GRID_SIZE}")
+    # 网格不超过 MAX_GRID_SIZE：空白不够时缩小 margin，已有布局偏移 margin 后仍能完整放下
+    margin = min(max((len(w) for w in new_words), default=0), MAX_GRID_SIZE - extent)
+    size = min(extent + 2 * margin, MAX_GRID_SIZE)
+    cw = Crossword(new_words, max(size, 1))
+    for e in kept:
+        row, col = e['row'] + margin, e['col'] + margin
+        if not cw.can_place(e['word'], row, col, e['direction']):
+            raise ValueError(f"布局中的单词 {e['word']} 与其他单词冲突")
+        cw.place_word(e['word'], row, col, e['direction'])
+
+    added, unplaced = [], list(cw.invalid_words)
+    # 长单词先放，交叉机会更多
+    for word in sorted(cw.words, key=len, reverse=True):
+        if len(word) > cw.size:
+            unplaced.append(word)
+            continue
+        if not cw.placed_words:
+            candidates = [((0, 0), cw.size // 2, (cw.size - len(word)) // 2, 'across')]
+        else:
+            candidates = cw.candidate_placements(word)[:1] or cw.isolated_placements(word, limit=1)
+        if not candidates:
+            unplaced.append(word)
+            continue
+        _, row, col, direction = candidates[0]
+        cw.place_word(word, row, col, direction)
+        added.append(word)
+
+    min_r, min_c = cw.bounds[:2] if cw.bounds else (margin, margin)
+    grid, new_layout = cw.to_grid(crop=True), cw.get_layout(crop=True)
+    added_set = set(added)
+    diff = {
+        'removed': removed,
+        'offset': {'row': margin - min_r, 'col': margin - min_c},
+        'added': [e for e in new_layout if e['word'] in added_set],
+        'unplaced': unplaced,
+        'rows': len(grid),
+        'cols': len(grid[0]) if grid else 0,
+    }
+    return grid, new_layout, diff
+
+def score_layout(grid: List[List[str]], layout: List[Dict]) -> Tuple[int, int, float, int]:
+    """布局评分，越大越好：(放置单词数, 交叉格数, 包围盒内字母密度, -包围盒面积)"""
+    if not layout:
+        return (0, 0, 0.0, 0)
+    coverage: Dict[Tuple[int, int], int] = {}
+    min_r = min(e['row'] for e in layout)
+    min_c = min(e['col'] for e in layout)
+    max_r = max_c = -1
+    for entry in layout:
+        dr, dc = (0, 1) if entry['direction'] == 'across' else (1, 0)
+        for i in range(len(entry['word'])):
+            cell = (entry['row'] + dr * i, entry['col'] + dc * i)
+            coverage[cell] = coverage.get(cell, 0) + 1
+        max_r = max(max_r, entry['row'] + dr * (len(entry['word']) - 1))
+        max_c = max(max_c, entry['col'] + dc * (len(entry['word']) - 1))
+    crossings = sum(1 for n in coverage.values() if n > 1)
+    area = (max_r - min_r + 1) * (max_c - min_c + 1)
+    return (len(layout), crossings, round(len(coverage) / area, 4), -area)
+
+def _attempt_seed(seed: int, attempt: int) -> int:
+    return (seed * 1000003 + attempt) % (2 ** 63)
+
+def _run_attempt(words: List[str], size: Optional[int], engine: str, time_budget: Optional[float],
+                 node_budget: Optional[int], seed: int, attempt: int, stop_at: Optional[float] = None):
+    """生成一个候选，返回 (attempt, grid, layout)；超过 stop_at（time.time()）才开始的候选跳过，grid 为 None"""
+    if stop_at is not None:
+        remaining = stop_at - time.time()
+        if remaining <= 0:
+            # 第 0 个候选总要完成，保证至少有一个结果
+            if attempt:
+                return attempt, None, None
+        elif engine == 'search':
+            # 搜索不超过剩余期限，期限到时正在运行的候选也会主动结束
+            time_budget = min(SEARCH_TIME_BUDGET if time_budget is None else time_budget, remaining)
+    # 第 0 次保持原始词序，其余按派生种子打乱词序
+    attempt_seed = _attempt_seed(seed, attempt)
+    ordered = list(words)
+    if attempt:
+        random.Random(attempt_seed).shuffle(ordered)
+    grid, layout = generate_crossword(ordered, size, engine, time_budget, node_budget, attempt_seed)
+    return attempt, grid, layout
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_generation_pool() -> ProcessPoolExecutor:
+    """返回共享的生成进程池"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=GENERATOR_WORKERS)
+    return _pool
+
+def generate_best_crossword(words: List[str], size: Optional[int] = None, attempts: int = 8,
+                            seed: Optional[int] = None, deadline: Optional[float] = None,
+                            engine: str = 'greedy', time_budget: Optional[float] = None,
+                            node_budget: Optional[int] = None, workers: Optional[int] = None):
+    """用不同种子和词序生成多个候选，返回评分最高的 (grid, layout, seed)
+
+    deadline 为墙钟时间上限（秒），到时只在已完成的候选中挑选（至少等待第 0 个候选）；
+    期限同时传给各候选，search 引擎的候选不会搜索到期限之后，期限后才开始的候选直接跳过。
+    同一 seed 且所有候选都在期限内完成时结果可复现；平分时取序号最小的候选。
+    workers 为 1 时在当前进程中依次生成，否则使用进程池。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的生成引擎: {engine}")
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    attempts = max(1, attempts)
+    workers = GENERATOR_WORKERS if workers is None else workers
+    # 工作进程之间用墙钟时间传递期限
+    stop_at = time.time() + deadline if deadline is not None else None
+    results = []
+
+    if workers <= 1 or attempts == 1:
+        for attempt in range(attempts):
+            results.append(_run_attempt(words, size, engine, time_budget, node_budget, seed, attempt, stop_at))
+            if stop_at is not None and time.time() >= stop_at:
+                break
+    else:
+        pool = get_generation_pool()
+        futures = [
+            pool.submit(_run_attempt, words, size, engine, time_budget, node_budget, seed, attempt, stop_at)
+            for attempt in range(attempts)
+        ]
+        timeout = max(0.0, stop_at - time.time()) if stop_at is not None else None
+        done, pending = wait(futures, timeout=timeout)
+        results = [future.result() for future in done]
+        if not any(grid is not None for _, grid, _ in results):
+            # 期限内没有完成的候选：等待第 0 个候选
+            results.append(futures[0].result())
+        for future in pending:
+            future.cancel()
+
+    results = [r for r in results if r[1] is not None]
+    attempt, grid, layout = max(results, key=lambda r: (score_layout(r[1], r[2]), -r[0]))
+    return grid, layout, seed
 
 if __name__ == '__main__':
     # 示例
@@ -1,5 +1,7 @@
+from functools import lru_cache
 from typing import List, Dict
 import json
+from metrics import STAGE_SECONDS
 
 def generate_crossword_html(grid: List[List[str]], layout: List[Dict], clues: Dict[str, str], 
                            output_file: str = 'crossword.html', style: str = 'classic'):
@@ -13,10 +15,7 @@ def generate_crossword_html(grid: List[List[str]], layout: List[Dict], clues: Di
         output_file: 输出文件名
         style: HTML样式 ('classic', 'modern', 'minimal', 'newspaper')
     """
-    size = len(grid)
-    
-    # 生成HTML内容
-    html_content = generate_html_template(grid, layout, clues, size, style)
+    html_content = render_crossword_html(grid, layout, clues, style)
     
     # 写入文件
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -24,6 +23,13 @@ def generate_crossword_html(grid: List[List[str]], layout: List[Dict], clues: Di
     
     print(f"填字游戏HTML已生成: {output_file}")
 
+def render_crossword_html(grid: List[List[str]], layout: List[Dict], clues: Dict[str, str],
+                          style: str = 'classic') -> str:
+    """在内存中渲染填字游戏HTML，不写文件"""
+    size = len(grid[0]) if grid else 0
+    with STAGE_SECONDS.time(stage="html"):
+        return generate_html_template(grid, layout, clues, size, style)
+
 def generate_html_template(grid: List[List[str]], layout: List[Dict], 
                           clues: Dict[str, str], size: int, style: str = 'classic'):
     """生成HTML模板"""
@@ -104,147 +110,248 @@ def generate_html_template(grid: List[List[str]], layout: List[Dict],
     
     return html_template
 
+_BLACK_CELL_HTML = '<div class="cell cell-black"></div>'
+# 有字母格子的固定片段，拼接时只需插入行列号、答案和编号
+_CELL_OPEN = '\n                <div class="cell" data-row="'
+_CELL_CLOSE = (
+    '\n                    <input type="text" maxlength="1" class="cell-input" '
+    '\n                           oninput="handleInput(this)" onkeydown="handleKeydown(event, this)">'
+    '\n                </div>'
+)
+
 def generate_grid_html(grid: List[List[str]], layout: List[Dict], size: int):
-    """生成网格HTML"""
+    """生成网格HTML，size 为列数（裁剪后的网格可能不是正方形）"""
     # 创建编号映射
     number_map = {}
     for entry in layout:
-        key = f"{entry['row']}-{entry['col']}"
-        if key not in number_map:
-            number_map[key] = entry['number']
-    
-    grid_html = f'<div class="crossword-grid" style="grid-template-columns: repeat({size}, 1fr);">'
+        number_map.setdefault((entry['row'], entry['col']), entry['number'])
     
-    for r in range(size):
+    parts = [f'<div class="crossword-grid" style="grid-template-columns: repeat({size}, 1fr);">']
+    append = parts.append
+    for r, row in enumerate(grid):
         for c in range(size):
-            cell_value = grid[r][c]
-            cell_key = f"{r}-{c}"
-            
+            cell_value = row[c]
             if cell_value:  # 有字母的格子
-                number = number_map.get(cell_key, '')
+                number = number_map.get((r, c))
                 number_html = f'<span class="cell-number">{number}</span>' if number else ''
-                
-                grid_html += f'''
-                <div class="cell" data-row="{r}" data-col="{c}" data-answer="{cell_value}">
-                    {number_html}
-                    <input type="text" maxlength="1" class="cell-input" 
-                           oninput="handleInput(this)" onkeydown="handleKeydown(event, this)">
-                </div>'''
+                append(f'{_CELL_OPEN}{r}" data-col="{c}" data-answer="{cell_value}">'
+                       f'\n                    {number_html}{_CELL_CLOSE}')
             else:  # 黑色格子
-                grid_html += '<div class="cell cell-black"></div>'
-    
-    grid_html += '</div>'
-    return grid_html
+                append(_BLACK_CELL_HTML)
+    parts.append('</div>')
+    return ''.join(parts)
 
 def generate_clues_html(across_clues: List[Dict], down_clues: List[Dict]):
     """生成题目列表HTML"""
-    clues_html = '<div class="clues-section">'
-    
-    # 横向题目
-    clues_html += '<div class="clues-group"><h3>横向</h3><ul class="clues-list">'
-    for clue in across_clues:
-        clues_html += f'<li><span class="clue-number">{clue["number"]}.</span> {clue["clue"]}</li>'
-    clues_html += '</ul></div>'
-    
-    # 纵向题目
-    clues_html += '<div class="clues-group"><h3>纵向</h3><ul class="clues-list">'
-    for clue in down_clues:
-        clues_html += f'<li><span class="clue-number">{clue["number"]}.</span> {clue["clue"]}</li>'
-    clues_html += '</ul></div>'
-    
-    clues_html += '</div>'
-    return clues_html
+    parts = ['<div class="clues-section">']
+    for title, clues in (('横向', across_clues), ('纵向', down_clues)):
+        parts.append(f'<div class="clues-group"><h3>{title}</h3><ul class="clues-list">')
+        parts.extend(
+            f'<li><span class="clue-number">{clue["number"]}.</span> {clue["clue"]}</li>'
+            for clue in clues
+        )
+        parts.append('</ul></div>')
+    parts.append('</div>')
+    return ''.join(parts)
 
-def generate_javascript(grid: List[List[str]], layout: List[Dict]):
-    """生成JavaScript代码"""
-    grid_json = json.dumps(grid)
-    layout_json = json.dumps(layout)
-    
-    return f"""
-        const GRID = {grid_json};
-        const LAYOUT = {layout_json};
-        
-        function handleInput(input) {{
+# 页面脚本中与题目无关的部分，只需拼接一次
+# 加载时由 GRID/LAYOUT 建立格子索引（row * COLS + col）和单词槽位表，
+# 输入、方向移动和计分都按索引查表，不再在每次按键时查询 DOM
+_JS_RUNTIME = """        const ROWS = GRID.length;
+        const COLS = ROWS ? GRID[0].length : 0;
+        const INPUTS = new Array(ROWS * COLS).fill(null);
+        const OPEN = [];
+        document.querySelectorAll('.cell-input').forEach(input => {
+            const cell = input.parentElement;
+            const index = Number(cell.dataset.row) * COLS + Number(cell.dataset.col);
+            input.dataset.index = index;
+            INPUTS[index] = input;
+            OPEN.push(index);
+        });
+        const ANSWERS = GRID.flat();
+        // 每个单词占用的格子，以及每个格子所在的横向/纵向单词和在单词中的位置
+        const SLOTS = LAYOUT.map(entry => {
+            const start = entry.row * COLS + entry.col;
+            const step = entry.direction === 'across' ? 1 : COLS;
+            return Array.from(entry.word, (_, i) => start + i * step);
+        });
+        const SLOT_OF = { across: new Int32Array(ROWS * COLS).fill(-1), down: new Int32Array(ROWS * COLS).fill(-1) };
+        const POS_OF = { across: new Int32Array(ROWS * COLS), down: new Int32Array(ROWS * COLS) };
+        SLOTS.forEach((cells, slot) => {
+            const dir = LAYOUT[slot].direction;
+            cells.forEach((index, pos) => {
+                SLOT_OF[dir][index] = slot;
+                POS_OF[dir][index] = pos;
+            });
+        });
+        // 同方向的下一个单词（按题号顺序，末尾回到第一个）
+        const NEXT_SLOT = SLOTS.map((_, slot) => {
+            for (let k = 1; k <= SLOTS.length; k++) {
+                const next = (slot + k) % SLOTS.length;
+                if (LAYOUT[next].direction === LAYOUT[slot].direction) return next;
+            }
+            return slot;
+        });
+        // 方向键的目标格：沿该方向最近的可输入格（跳过黑格），没有时为 -1
+        function buildNeighbors(dr, dc) {
+            const next = new Int32Array(ROWS * COLS).fill(-1);
+            const outer = dc !== 0 ? ROWS : COLS;
+            const inner = dc !== 0 ? COLS : ROWS;
+            const forward = dr + dc > 0;
+            for (let a = 0; a < outer; a++) {
+                let last = -1;
+                // 逆着移动方向扫描，记住最近经过的可输入格
+                for (let k = 0; k < inner; k++) {
+                    const b = forward ? inner - 1 - k : k;
+                    const index = dc !== 0 ? a * COLS + b : b * COLS + a;
+                    next[index] = last;
+                    if (INPUTS[index]) last = index;
+                }
+            }
+            return next;
+        }
+        const NEIGHBORS = {
+            ArrowRight: buildNeighbors(0, 1),
+            ArrowLeft: buildNeighbors(0, -1),
+            ArrowDown: buildNeighbors(1, 0),
+            ArrowUp: buildNeighbors(-1, 0)
+        };
+        const CORRECT = new Uint8Array(ROWS * COLS);
+        let correctCount = 0;
+        let direction = 'across';
+
+        function otherDirection(dir) {
+            return dir === 'across' ? 'down' : 'across';
+        }
+
+        function updateCorrect(index) {
+            const ok = INPUTS[index].value === ANSWERS[index] ? 1 : 0;
+            correctCount += ok - CORRECT[index];
+            CORRECT[index] = ok;
+        }
+
+        // 聚焦的格子不在当前方向的单词里时切换方向；再次点击同一格切换方向
+        document.addEventListener('focusin', event => {
+            const index = Number(event.target.dataset.index);
+            if (event.target.classList.contains('cell-input') && SLOT_OF[direction][index] < 0) {
+                direction = otherDirection(direction);
+            }
+        });
+        document.addEventListener('mousedown', event => {
+            const input = event.target;
+            if (input === document.activeElement && input.classList.contains('cell-input')) {
+                const index = Number(input.dataset.index);
+                if (SLOT_OF.across[index] >= 0 && SLOT_OF.down[index] >= 0) {
+                    direction = otherDirection(direction);
+                }
+            }
+        });
+
+        function handleInput(input) {
             input.value = input.value.toUpperCase();
-            if (input.value) {{
+            updateCorrect(Number(input.dataset.index));
+            if (input.value) {
                 moveToNext(input);
-            }}
-        }}
+            }
+        }
         
-        function handleKeydown(event, input) {{
-            if (event.key === 'Backspace' && !input.value) {{
+        function handleKeydown(event, input) {
+            if (event.key === 'Backspace' && !input.value) {
                 moveToPrevious(input);
-            }} else if (event.key === 'ArrowRight') {{
-                event.preventDefault();
-                moveToNext(input);
-            }} else if (event.key === 'ArrowLeft') {{
+            } else if (NEIGHBORS[event.key]) {
                 event.preventDefault();
-                moveToPrevious(input);
-            }}
-        }}
-        
-        function moveToNext(currentInput) {{
-            const cells = Array.from(document.querySelectorAll('.cell-input'));
-            const currentIndex = cells.indexOf(currentInput);
-            if (currentIndex < cells.length - 1) {{
-                cells[currentIndex + 1].focus();
-            }}
-        }}
-        
-        function moveToPrevious(currentInput) {{
-            const cells = Array.from(document.querySelectorAll('.cell-input'));
-            const currentIndex = cells.indexOf(currentInput);
-            if (currentIndex > 0) {{
-                cells[currentIndex - 1].focus();
-            }}
-        }}
-        
-        function checkAnswers() {{
-            let correct = 0;
-            let total = 0;
-            
-            document.querySelectorAll('.cell').forEach(cell => {{
-                const input = cell.querySelector('.cell-input');
-                if (input) {{
-                    total++;
-                    const answer = cell.dataset.answer;
-                    const userInput = input.value.toUpperCase();
-                    
-                    cell.classList.remove('correct', 'incorrect');
-                    
-                    if (userInput === answer) {{
-                        correct++;
-                        cell.classList.add('correct');
-                    }} else if (userInput) {{
-                        cell.classList.add('incorrect');
-                    }}
-                }}
-            }});
-            
-            alert(`正确: ${{correct}}/${{total}}`);
-        }}
-        
-        function clearAll() {{
-            document.querySelectorAll('.cell-input').forEach(input => {{
-                input.value = '';
-                input.parentElement.classList.remove('correct', 'incorrect');
-            }});
-        }}
-        
-        function showAnswers() {{
-            document.querySelectorAll('.cell').forEach(cell => {{
-                const input = cell.querySelector('.cell-input');
-                if (input) {{
-                    input.value = cell.dataset.answer;
+                direction = event.key === 'ArrowLeft' || event.key === 'ArrowRight' ? 'across' : 'down';
+                const target = NEIGHBORS[event.key][Number(input.dataset.index)];
+                if (target >= 0) {
+                    INPUTS[target].focus();
+                }
+            }
+        }
+        
+        // 沿当前方向的单词前进，单词末尾跳到同方向下一个单词的首格
+        function moveToNext(currentInput) {
+            const index = Number(currentInput.dataset.index);
+            if (SLOT_OF[direction][index] < 0) {
+                direction = otherDirection(direction);
+            }
+            const slot = SLOT_OF[direction][index];
+            if (slot < 0) return;
+            const cells = SLOTS[slot];
+            const pos = POS_OF[direction][index];
+            INPUTS[pos < cells.length - 1 ? cells[pos + 1] : SLOTS[NEXT_SLOT[slot]][0]].focus();
+        }
+        
+        function moveToPrevious(currentInput) {
+            const index = Number(currentInput.dataset.index);
+            if (SLOT_OF[direction][index] < 0) {
+                direction = otherDirection(direction);
+            }
+            const slot = SLOT_OF[direction][index];
+            const pos = POS_OF[direction][index];
+            if (slot >= 0 && pos > 0) {
+                INPUTS[SLOTS[slot][pos - 1]].focus();
+            }
+        }
+        
+        function checkAnswers() {
+            for (const index of OPEN) {
+                const input = INPUTS[index];
+                const cell = input.parentElement;
+                cell.classList.remove('correct', 'incorrect');
+                if (CORRECT[index]) {
                     cell.classList.add('correct');
-                    cell.classList.remove('incorrect');
-                }}
-            }});
-        }}
+                } else if (input.value) {
+                    cell.classList.add('incorrect');
+                }
+            }
+            
+            alert(`正确: ${correctCount}/${OPEN.length}`);
+        }
+        
+        function clearAll() {
+            for (const index of OPEN) {
+                INPUTS[index].value = '';
+                INPUTS[index].parentElement.classList.remove('correct', 'incorrect');
+                CORRECT[index] = 0;
+            }
+            correctCount = 0;
+        }
+        
+        function showAnswers() {
+            for (const index of OPEN) {
+                const input = INPUTS[index];
+                input.value = ANSWERS[index];
+                input.parentElement.classList.add('correct');
+                input.parentElement.classList.remove('incorrect');
+                CORRECT[index] = 1;
+            }
+            correctCount = OPEN.length;
+        }
     """
 
+def generate_javascript(grid: List[List[str]], layout: List[Dict]):
+    """生成JavaScript代码：题目数据 + 固定的运行时脚本"""
+    grid_json = json.dumps(grid)
+    layout_json = json.dumps(layout)
+    return f"""
+        const GRID = {grid_json};
+        const LAYOUT = {layout_json};
+        
+""" + _JS_RUNTIME
+
+STYLES = ('classic', 'modern', 'minimal', 'newspaper')
+
+@lru_cache(maxsize=len(STYLES))
+def _cached_css_styles(style: str) -> str:
+    return build_css_styles(style)
+
 def get_css_styles(style: str = 'classic'):
-    """获取CSS样式"""
+    """获取CSS样式，每种样式只构建一次"""
+    # 未知样式与 classic 的输出相同，统一缓存为 classic
+    return _cached_css_styles(style if style in STYLES else 'classic')
+
+def build_css_styles(style: str = 'classic'):
+    """构建CSS样式文本（不经缓存）"""
     base_styles = """
         * {
             margin: 0;
@@ -504,7 +611,6 @@ def get_css_styles(style: str = 'classic'):
 if __name__ == "__main__":
     # 测试示例
     from crossword_generator import generate_crossword
-    from llm_definition import batch_generate_definitions
     
     words = ['apple', 'banana', 'orange']
     grid, layout = generate_crossword(words)
@@ -1,11 +1,22 @@
+import argparse
+import asyncio
+import json
 import os
 import random
+import re
 import string
+import time
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
-from crossword_generator import generate_crossword
+from crossword_generator import generate_crossword, get_generation_pool, GENERATOR_WORKERS
 from llm_definition import batch_generate_definitions
-from crossword_html import generate_crossword_html
-from upload_oss import upload_to_oss
+from crossword_html import generate_crossword_html, render_crossword_html
+from upload_oss import upload_to_oss, get_uploader
+
+# 批量模式各阶段同时处理的词表数
+PIPELINE_GEN_WORKERS = int(os.getenv("PIPELINE_GEN_WORKERS", GENERATOR_WORKERS))
+PIPELINE_LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", 2))
+PIPELINE_UPLOAD_WORKERS = int(os.getenv("PIPELINE_UPLOAD_WORKERS", 4))
 
 def read_words_from_txt(txt_path):
     with open(txt_path, 'r', encoding='utf-8') as f:
@@ -34,6 +45,199 @@ def main(txt_path):
     print('最终访问地址:', url)
     return url
 
+def upload_html(file_path: str) -> str:
+    """用共享的上传客户端按内容哈希上传，失败时抛出异常"""
+    return get_uploader().upload_file(file_path)
+
+def job_id_for(path: str) -> str:
+    """由词表文件名得到任务 ID，只保留可用于文件名的字符"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'[^A-Za-z0-9_.-]+', '-', stem).strip('-') or 'words'
+
+def load_jobs(source: str) -> List[Dict]:
+    """读取批量任务，返回 [{'id': ..., 'words': [...]}]
+
+    source 可以是：
+      - 目录：其中每个 .txt 文件是一份词表
+      - .jsonl 清单：每行 {"id": ..., "path": ...} 或 {"id": ..., "words": [...]}，
+        path 相对于清单所在目录
+    """
+    jobs = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith('.txt'):
+                path = os.path.join(source, name)
+                jobs.append({'id': job_id_for(path), 'words': read_words_from_txt(path)})
+    else:
+        base = os.path.dirname(source)
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'words' in entry:
+                    words = entry['words']
+                else:
+                    words = read_words_from_txt(os.path.join(base, entry['path']))
+                jobs.append({'id': str(entry.get('id') or job_id_for(entry['path'])), 'words': words})
+    ids = [job['id'] for job in jobs]
+    if len(ids) != len(set(ids)):
+        raise ValueError('批量任务中存在重复的 id')
+    return jobs
+
+class Checkpoint:
+    """以 JSON Lines 追加记录已完成的任务，重启后跳过这些任务"""
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 上次崩溃时可能只写了半行
+                        continue
+                    self.done[record['id']] = record
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, record: Dict):
+        self.done[record['id']] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class BatchPipeline:
+    """流式批量流水线：生成布局 -> LLM 提示 -> 渲染 HTML -> 上传
+
+    每个词表独立流经各阶段，各阶段用单独的并发上限，一个词表在等待 LLM 时
+    其他词表可以继续生成或上传。define 和 upload 可以替换成桩实现：
+      define(words) -> {word: clue}
+      upload(file_path) -> url
+    """
+    def __init__(self, output_dir: str = 'output', style: str = 'classic',
+                 define: Callable[[List[str]], Dict[str, str]] = batch_generate_definitions,
+                 upload: Optional[Callable[[str], str]] = upload_html,
+                 gen_workers: int = PIPELINE_GEN_WORKERS, llm_workers: int = PIPELINE_LLM_WORKERS,
+                 upload_workers: int = PIPELINE_UPLOAD_WORKERS, checkpoint_path: Optional[str] = None,
+                 manifest_path: Optional[str] = None):
+        self.output_dir = output_dir
+        self.style = style
+        self.define = define
+        self.upload = upload
+        self.gen_workers = gen_workers
+        self.llm_workers = llm_workers
+        self.upload_workers = upload_workers
+        self.checkpoint_path = checkpoint_path or os.path.join(output_dir, 'checkpoint.jsonl')
+        self.manifest_path = manifest_path or os.path.join(output_dir, 'manifest.json')
+
+    async def _process(self, job: Dict, checkpoint: Checkpoint, gen_sem: asyncio.Semaphore,
+                       llm_sem: asyncio.Semaphore, upload_sem: asyncio.Semaphore):
+        start = time.perf_counter()
+        words = job['words']
+        loop = asyncio.get_running_loop()
+
+        async def generate():
+            async with gen_sem:
+                return await loop.run_in_executor(get_generation_pool(), generate_crossword, words)
+
+        async def define():
+            async with llm_sem:
+                return await asyncio.to_thread(self.define, words)
+
+        # 布局生成与提示获取互不依赖，并行执行
+        (grid, layout), clues = await asyncio.gather(generate(), define())
+        html_path = os.path.join(self.output_dir, f"{job['id']}.html")
+        html = render_crossword_html(grid, layout, clues, self.style)
+        await asyncio.to_thread(_write_text, html_path, html)
+
+        url = None
+        if self.upload is not None:
+            async with upload_sem:
+                url = await asyncio.to_thread(self.upload, html_path)
+        placed = {entry['word'] for entry in layout}
+        checkpoint.record({
+            'id': job['id'],
+            'html': html_path,
+            'url': url,
+            'words': len(words),
+            'placed': len(placed),
+            'seconds': round(time.perf_counter() - start, 3),
+        })
+        print(f"[{job['id']}] 完成 {len(placed)}/{len(words)} 个单词 -> {url or html_path}")
+
+    async def run(self, jobs: List[Dict]) -> Dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        checkpoint = Checkpoint(self.checkpoint_path)
+        pending = [job for job in jobs if job['id'] not in checkpoint.done]
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f'从检查点恢复，跳过 {skipped} 个已完成的任务')
+        gen_sem = asyncio.Semaphore(self.gen_workers)
+        llm_sem = asyncio.Semaphore(self.llm_workers)
+        upload_sem = asyncio.Semaphore(self.upload_workers)
+        failed = {}
+
+        async def run_one(job):
+            if not job['words']:
+                failed[job['id']] = '单词列表为空'
+                return
+            try:
+                await self._process(job, checkpoint, gen_sem, llm_sem, upload_sem)
+            except Exception as e:
+                # 单个任务失败不影响其他任务，下次运行会重试
+                failed[job['id']] = str(e)
+                print(f"[{job['id']}] 失败: {e}")
+
+        try:
+            await asyncio.gather(*(run_one(job) for job in pending))
+        finally:
+            checkpoint.close()
+
+        manifest = {
+            job['id']: checkpoint.done[job['id']].get('url') or checkpoint.done[job['id']]['html']
+            for job in jobs if job['id'] in checkpoint.done
+        }
+        _write_text(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+        return {'done': len(manifest), 'skipped': skipped, 'failed': failed,
+                'manifest': self.manifest_path}
+
+def _write_text(path: str, text: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def run_batch(source: str, **kwargs) -> Dict:
+    return asyncio.run(BatchPipeline(**kwargs).run(load_jobs(source)))
+
 if __name__ == '__main__':
-    # 假设单词列表文件为 words.txt
-    main('words.txt')
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='生成填字游戏并上传')
+    parser.add_argument('source', nargs='?', default='words.txt',
+                        help='单词列表文件；--batch 时为词表目录或 .jsonl 清单')
+    parser.add_argument('--batch', action='store_true', help='批量模式')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--style', default='classic')
+    parser.add_argument('--checkpoint', help='检查点文件，默认 <output-dir>/checkpoint.jsonl')
+    parser.add_argument('--manifest', help='URL 清单文件，默认 <output-dir>/manifest.json')
+    parser.add_argument('--gen-workers', type=int, default=PIPELINE_GEN_WORKERS)
+    parser.add_argument('--llm-workers', type=int, default=PIPELINE_LLM_WORKERS)
+    parser.add_argument('--upload-workers', type=int, default=PIPELINE_UPLOAD_WORKERS)
+    parser.add_argument('--no-upload', action='store_true', help='只写本地 HTML，不上传')
+    args = parser.parse_args()
+
+    if args.batch:
+        summary = run_batch(
+            args.source, output_dir=args.output_dir, style=args.style,
+            upload=None if args.no_upload else upload_html,
+            gen_workers=args.gen_workers, llm_workers=args.llm_workers,
+            upload_workers=args.upload_workers, checkpoint_path=args.checkpoint,
+            manifest_path=args.manifest)
+        print(f"完成 {summary['done']} 个（跳过 {summary['skipped']} 个），"
+              f"失败 {len(summary['failed'])} 个，清单: {summary['manifest']}")
+    else:
+        main(args.source)
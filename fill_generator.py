@@ -0,0 +1,359 @@
+"""
+密排（报纸式）填字游戏生成：给定黑格图案和词典，填满图案中的每一个词槽
+
+图案用字符串列表表示，'#' 为黑格，'.' 为待填格，字母表示预先给定的字母。
+词典按 (长度, 位置, 字母) 建立位图索引，求解时用 MRV 选择词槽，并用位图做
+约束传播（弧相容），在时间预算内随机重启搜索。
+"""
+import os
+import random
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+FILL_DICTIONARY_PATH = os.getenv("FILL_DICTIONARY_PATH", "dictionary.txt")
+FILL_TIME_BUDGET = float(os.getenv("FILL_TIME_BUDGET", 10))
+BLOCK = '#'
+EMPTY = '.'
+# 首次重启前最多尝试的节点数，超过后换随机顺序重新开始，之后每次放宽 1.5 倍
+RESTART_NODES = 200
+# 每个词槽按约束程度排序时评估的候选词数
+SAMPLE_CANDIDATES = 24
+
+PATTERNS = {
+    '5x5': [
+        '#....',
+        '.....',
+        '.....',
+        '.....',
+        '....#',
+    ],
+    '13x13': [
+        '....#...#....',
+        '....#...#....',
+        '.............',
+        '###...#...###',
+        '....#...#....',
+        '...#.....#...',
+        '......#......',
+        '...#.....#...',
+        '....#...#....',
+        '###...#...###',
+        '.............',
+        '....#...#....',
+        '....#...#....',
+    ],
+    '15x15': [
+        '....#....#.....',
+        '....#....#.....',
+        '...............',
+        '###...#....#...',
+        '....#....#.....',
+        '.....#....#....',
+        '...#....#...###',
+        '......#.#......',
+        '###...#....#...',
+        '....#....#.....',
+        '.....#....#....',
+        '...#....#...###',
+        '...............',
+        '.....#....#....',
+        '.....#....#....',
+    ],
+}
+
+def parse_pattern(pattern: Union[str, Sequence[str]]) -> List[str]:
+    """规范化图案：支持多行字符串或行列表，字母转为大写"""
+    if isinstance(pattern, str):
+        pattern = PATTERNS.get(pattern) or pattern.split()
+    rows = [row.strip().upper() for row in pattern if row.strip()]
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError('图案必须是等长的行')
+    for row in rows:
+        for ch in row:
+            if ch not in (BLOCK, EMPTY) and not ('A' <= ch <= 'Z'):
+                raise ValueError(f'图案中存在无效字符: {ch!r}')
+    return rows
+
+class WordIndex:
+    """按长度分组的词典，(位置, 字母) -> 单词位图，用于按已知字母快速筛选候选词"""
+    def __init__(self, words: Sequence[str]):
+        by_length: Dict[int, List[str]] = {}
+        seen = set()
+        for w in words:
+            w = w.strip().upper()
+            if len(w) >= 2 and w.isascii() and w.isalpha() and w not in seen:
+                seen.add(w)
+                by_length.setdefault(len(w), []).append(w)
+        self.by_length = by_length
+        # 长度 -> 每个位置一个 {字母: 位图}
+        self.masks: Dict[int, List[Dict[str, int]]] = {}
+        self.full: Dict[int, int] = {}
+        for length, bucket in by_length.items():
+            nbytes = (len(bucket) + 7) // 8
+            positions = []
+            for p in range(length):
+                bitmaps: Dict[str, bytearray] = {}
+                for i, w in enumerate(bucket):
+                    bitmap = bitmaps.get(w[p])
+                    if bitmap is None:
+                        bitmap = bitmaps[w[p]] = bytearray(nbytes)
+                    bitmap[i >> 3] |= 1 << (i & 7)
+                positions.append({ch: int.from_bytes(b, 'little') for ch, b in bitmaps.items()})
+            self.masks[length] = positions
+            self.full[length] = (1 << len(bucket)) - 1
+
+    @classmethod
+    def from_file(cls, path: str) -> 'WordIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(f.read().split())
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.by_length.values())
+
+    def candidates(self, pattern: str) -> int:
+        """返回匹配 pattern（'.' 为任意字母）的单词位图"""
+        length = len(pattern)
+        mask = self.full.get(length, 0)
+        positions = self.masks.get(length)
+        for p, ch in enumerate(pattern):
+            if ch != EMPTY and mask:
+                mask &= positions[p].get(ch, 0)
+        return mask
+
+    def matches(self, pattern: str, limit: Optional[int] = None) -> List[str]:
+        bucket = self.by_length.get(len(pattern), [])
+        return [bucket[i] for i in _iter_bits(self.candidates(pattern))][:limit]
+
+@lru_cache(maxsize=4)
+def get_word_index(path: str = FILL_DICTIONARY_PATH) -> WordIndex:
+    """加载并缓存词典索引（每个进程只构建一次）"""
+    return WordIndex.from_file(path)
+
+def _iter_bits(mask: int, start: int = 0):
+    """按位序遍历置位的下标，从 start 开始并回绕，用于随机化取值顺序"""
+    high = mask >> start << start
+    for part in (high, mask ^ high):
+        while part:
+            low = part & -part
+            yield low.bit_length() - 1
+            part ^= low
+
+class Slot:
+    __slots__ = ('row', 'col', 'direction', 'length', 'cells', 'crossings')
+
+    def __init__(self, row: int, col: int, direction: str, cells: List[int]):
+        self.row = row
+        self.col = col
+        self.direction = direction
+        self.length = len(cells)
+        self.cells = cells
+        # (本词槽位置, 交叉词槽下标, 交叉词槽位置)
+        self.crossings: List[Tuple[int, int, int]] = []
+
+def find_slots(rows: List[str]) -> List[Slot]:
+    """找出所有长度 >= 2 的横向和纵向词槽，并记录交叉关系"""
+    height, width = len(rows), len(rows[0])
+    columns = [''.join(row[c] for row in rows) for c in range(width)]
+    slots: List[Slot] = []
+    for direction, lines in (('across', rows), ('down', columns)):
+        for i, line in enumerate(lines):
+            j = 0
+            while j < len(line):
+                if line[j] == BLOCK:
+                    j += 1
+                    continue
+                start = j
+                while j < len(line) and line[j] != BLOCK:
+                    j += 1
+                if j - start < 2:
+                    continue
+                if direction == 'across':
+                    slots.append(Slot(i, start, direction, [i * width + k for k in range(start, j)]))
+                else:
+                    slots.append(Slot(start, i, direction, [k * width + i for k in range(start, j)]))
+    owners: Dict[int, List[Tuple[int, int]]] = {}
+    for s, slot in enumerate(slots):
+        for p, cell in enumerate(slot.cells):
+            owners.setdefault(cell, []).append((s, p))
+    for entries in owners.values():
+        if len(entries) == 2:
+            (a, pa), (b, pb) = entries
+            slots[a].crossings.append((pa, b, pb))
+            slots[b].crossings.append((pb, a, pa))
+    return slots
+
+class FillSolver:
+    """词槽填充求解器：MRV + 位图弧相容传播 + 随机重启"""
+    def __init__(self, rows: List[str], index: WordIndex, rng: Optional[random.Random] = None,
+                 time_budget: float = FILL_TIME_BUDGET, restart_nodes: int = RESTART_NODES):
+        self.rows = rows
+        self.index = index
+        self.rng = rng or random.Random()
+        self.time_budget = time_budget
+        self.restart_nodes = restart_nodes
+        self.slots = find_slots(rows)
+        self.nodes = 0
+        self.restarts = 0
+
+    def _initial_domains(self) -> Optional[List[int]]:
+        domains = []
+        for slot in self.slots:
+            pattern = ''.join(self.rows[cell // len(self.rows[0])][cell % len(self.rows[0])]
+                              for cell in slot.cells)
+            domain = self.index.candidates(pattern)
+            if not domain:
+                return None
+            domains.append(domain)
+        return domains
+
+    def _letters(self, s: int, p: int, domain: int) -> List[str]:
+        return [ch for ch, m in self.index.masks[self.slots[s].length][p].items() if m & domain]
+
+    def _propagate(self, domains: List[int], queue: List[int]) -> bool:
+        """弧相容：某词槽的候选集变化后，收缩与之交叉的词槽，直到不再变化"""
+        masks = self.index.masks
+        while queue:
+            s = queue.pop()
+            for p, t, q in self.slots[s].crossings:
+                allowed = 0
+                t_masks = masks[self.slots[t].length][q]
+                for ch in self._letters(s, p, domains[s]):
+                    allowed |= t_masks.get(ch, 0)
+                narrowed = domains[t] & allowed
+                if narrowed != domains[t]:
+                    if not narrowed:
+                        return False
+                    domains[t] = narrowed
+                    queue.append(t)
+        return True
+
+    def _assign(self, domains: List[int], assigned: List[Optional[int]], s: int, word: int) -> bool:
+        domains[s] = 1 << word
+        assigned[s] = word
+        bit = ~(1 << word)
+        queue = [s]
+        # 同一个单词不能出现两次
+        length = self.slots[s].length
+        for t, slot in enumerate(self.slots):
+            if t != s and slot.length == length and domains[t] >> word & 1:
+                domains[t] &= bit
+                if not domains[t]:
+                    return False
+                queue.append(t)
+        return self._propagate(domains, queue)
+
+    def _order_candidates(self, domains: List[int], s: int) -> List[int]:
+        """随机抽取部分候选词，按交叉词槽剩余候选数（越多越好）排序"""
+        slot = self.slots[s]
+        masks = self.index.masks
+        bucket = self.index.by_length[slot.length]
+        start = self.rng.randrange(len(bucket))
+        scored = []
+        for word in _iter_bits(domains[s], start):
+            text = bucket[word]
+            score = None
+            for p, t, q in slot.crossings:
+                count = (domains[t] & masks[self.slots[t].length][q].get(text[p], 0)).bit_count()
+                if not count:
+                    break
+                score = count if score is None else min(score, count)
+            else:
+                scored.append((score or 0, word))
+            if len(scored) >= SAMPLE_CANDIDATES:
+                break
+        scored.sort(reverse=True)
+        return [word for _, word in scored]
+
+    def _select(self, domains: List[int], assigned: List[Optional[int]]) -> Optional[int]:
+        """MRV：返回候选最少的未填词槽，全部填完时返回 None"""
+        unassigned = [s for s in range(len(self.slots)) if assigned[s] is None]
+        if not unassigned:
+            return None
+        return min(unassigned, key=lambda i: domains[i].bit_count())
+
+    def _search(self, domains: List[int], assigned: List[Optional[int]], deadline: float,
+                node_limit: int) -> Optional[List[Optional[int]]]:
+        # 用显式栈代替递归：大图案有上千个词槽，递归深度会超过解释器限制
+        s = self._select(domains, assigned)
+        if s is None:
+            return assigned
+        stack = [(domains, assigned, s, iter(self._order_candidates(domains, s)))]
+        while stack:
+            domains, assigned, s, candidates = stack[-1]
+            word = next(candidates, None)
+            if word is None:
+                stack.pop()
+                continue
+            self.nodes += 1
+            if self.nodes >= node_limit or time.perf_counter() > deadline:
+                return None
+            next_domains = domains[:]
+            next_assigned = assigned[:]
+            if not self._assign(next_domains, next_assigned, s, word):
+                continue
+            t = self._select(next_domains, next_assigned)
+            if t is None:
+                return next_assigned
+            stack.append((next_domains, next_assigned, t, iter(self._order_candidates(next_domains, t))))
+        return None
+
+    def solve(self) -> Optional[List[str]]:
+        """返回每个词槽填入的单词，时间预算内无解时返回 None"""
+        deadline = time.perf_counter() + self.time_budget
+        domains = self._initial_domains()
+        if domains is None:
+            return None
+        # 图案中已经确定的词槽先传播一次
+        if not self._propagate(domains, list(range(len(self.slots)))):
+            return None
+        restart_nodes = self.restart_nodes
+        while time.perf_counter() < deadline:
+            self.restarts += 1
+            result = self._search(domains[:], [None] * len(self.slots), deadline,
+                                  self.nodes + int(restart_nodes))
+            restart_nodes *= 1.5
+            if result is not None:
+                return [self.index.by_length[slot.length][word]
+                        for slot, word in zip(self.slots, result)]
+        return None
+
+def fill_crossword(pattern: Union[str, Sequence[str]], dictionary: Optional[Union[str, WordIndex]] = None,
+                   seed: Optional[int] = None, time_budget: Optional[float] = None):
+    """按图案填满密排网格，返回与 generate_crossword 相同格式的 (grid, layout)
+
+    dictionary 可以是词典文件路径或已构建的 WordIndex，默认使用 FILL_DICTIONARY_PATH。
+    时间预算内无法填满时抛出 ValueError。
+    """
+    rows = parse_pattern(pattern)
+    if dictionary is None or isinstance(dictionary, str):
+        index = get_word_index(dictionary or FILL_DICTIONARY_PATH)
+    else:
+        index = dictionary
+    solver = FillSolver(rows, index, random.Random(seed),
+                        FILL_TIME_BUDGET if time_budget is None else time_budget)
+    words = solver.solve()
+    if words is None:
+        raise ValueError(f'无法在时间预算内填满图案（已搜索 {solver.nodes} 个节点）')
+
+    width = len(rows[0])
+    grid = [['' if ch == BLOCK else ch for ch in row] for row in rows]
+    for slot, word in zip(solver.slots, words):
+        for cell, ch in zip(slot.cells, word):
+            grid[cell // width][cell % width] = ch
+    layout = [
+        {'word': word, 'row': slot.row, 'col': slot.col, 'direction': slot.direction}
+        for slot, word in zip(solver.slots, words)
+    ]
+    # 与其他生成器一致：按行列顺序排列，便于编号
+    layout.sort(key=lambda e: (e['row'], e['col'], e['direction']))
+    return grid, layout
+
+if __name__ == '__main__':
+    import sys
+    name = sys.argv[1] if len(sys.argv) > 1 else '5x5'
+    start = time.perf_counter()
+    grid, layout = fill_crossword(name)
+    for row in grid:
+        print(' '.join(ch or '#' for ch in row))
+    print(f'{len(layout)} 个单词, 用时 {time.perf_counter() - start:.2f}s')
@@ -1,50 +1,388 @@
 import os
+import json
+import logging
+import time
+import asyncio
+import threading
+import httpx
 import requests
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
+from clue_cache import get_clue_cache
+from metrics import LLM_REQUESTS, LLM_RETRIES, LLM_ERRORS, LLM_REQUEST_SECONDS, STAGE_SECONDS
 
 
 # 加载.env文件
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-DASHSCOPE_API_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+
+DASHSCOPE_API_URL = os.getenv("DASHSCOPE_API_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions")
 DASHSCOPE_MODEL = os.getenv("DASHSCOPE_MODEL", "qwen-turbo")
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
 
+# 并发、超时与重试配置
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", 0.5))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", 10))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+SYSTEM_PROMPT = "You are a helpful English teacher for children."
+# 修改提示词后需要递增，使旧的缓存解释失效
+PROMPT_VERSION = "v2"
+
 HEADERS = {
     "Authorization": f"Bearer {DASHSCOPE_API_KEY}",
     "Content-Type": "application/json"
 }
 
-def get_simple_english_definition(word: str) -> str:
-    prompt = f"Explain the word '{word}' in simple English for elementary school students. Only return the explanation, do not repeat the word."
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """返回共享的 HTTP Session，连接池大小与并发数一致"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """返回共享的异步 HTTP 客户端，供事件循环内调用"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=LLM_CONCURRENCY, max_keepalive_connections=LLM_CONCURRENCY),
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _retry_delay(attempt: int, resp) -> float:
+    # 优先使用服务端给出的 Retry-After，否则指数退避
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return LLM_BACKOFF * (2 ** attempt)
+
+def _record_attempt(status: Optional[int], attempt: int):
+    # status 为 None 表示连接错误或超时
+    reason = str(status) if status is not None else "connection"
+    LLM_REQUESTS.inc(status=reason)
+    if status is not None and status < 400:
+        return
+    if status is not None and status not in RETRY_STATUS:
+        LLM_ERRORS.inc(reason=reason)
+    elif attempt >= LLM_MAX_RETRIES:
+        LLM_ERRORS.inc(reason=reason)
+    else:
+        LLM_RETRIES.inc(reason=reason)
+
+def post_chat_completion(data: Dict, timeout: Optional[float] = None) -> Dict:
+    """调用 chat-completions 接口，遇到 429/5xx 或网络错误时退避重试"""
+    session = get_session()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        resp = None
+        try:
+            with LLM_REQUEST_SECONDS.time():
+                resp = session.post(DASHSCOPE_API_URL, headers=HEADERS, json=data,
+                                    timeout=timeout or LLM_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            _record_attempt(None, attempt)
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+        else:
+            _record_attempt(resp.status_code, attempt)
+            if resp.status_code not in RETRY_STATUS or attempt >= LLM_MAX_RETRIES:
+                resp.raise_for_status()
+                return resp.json()
+        time.sleep(_retry_delay(attempt, resp))
+    raise RuntimeError("unreachable")
+
+async def apost_chat_completion(data: Dict, timeout: Optional[float] = None) -> Dict:
+    """post_chat_completion 的异步版本"""
+    client = get_async_client()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        resp = None
+        try:
+            with LLM_REQUEST_SECONDS.time():
+                resp = await client.post(DASHSCOPE_API_URL, headers=HEADERS, json=data,
+                                         timeout=timeout or LLM_TIMEOUT)
+        except httpx.TransportError:
+            _record_attempt(None, attempt)
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+        else:
+            _record_attempt(resp.status_code, attempt)
+            if resp.status_code not in RETRY_STATUS or attempt >= LLM_MAX_RETRIES:
+                resp.raise_for_status()
+                return resp.json()
+        await asyncio.sleep(_retry_delay(attempt, resp))
+    raise RuntimeError("unreachable")
+
+class UsageStats:
+    """累计一次出题过程中的请求数和 token 用量"""
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, result: Dict):
+        usage = (result.get("usage") or {}) if isinstance(result, dict) else {}
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.total_tokens += usage.get("total_tokens", 0)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+        }
+
+def _chat_data(prompt: str, json_mode: bool = False) -> Dict:
     data = {
         "model": DASHSCOPE_MODEL,
         "messages": [
-            {"role": "system", "content": "You are a helpful English teacher for children."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
     }
-    resp = requests.post(DASHSCOPE_API_URL, headers=HEADERS, json=data, timeout=20)
-    resp.raise_for_status()
-    result = resp.json()
+    if json_mode:
+        data["response_format"] = {"type": "json_object"}
+    return data
+
+def _reply_content(result: Dict, stats: Optional[UsageStats] = None) -> str:
+    if stats is not None:
+        stats.add(result)
     # 兼容通义千问 OpenAI 兼容接口格式
     try:
         return result["choices"][0]["message"]["content"].strip()
     except Exception:
         return str(result)
 
-def batch_generate_definitions(words: List[str]) -> Dict[str, str]:
-    definitions = {}
-    for word in words:
+def _chat(prompt: str, stats: Optional[UsageStats] = None, json_mode: bool = False) -> str:
+    return _reply_content(post_chat_completion(_chat_data(prompt, json_mode)), stats)
+
+async def _achat(prompt: str, stats: Optional[UsageStats] = None, json_mode: bool = False) -> str:
+    return _reply_content(await apost_chat_completion(_chat_data(prompt, json_mode)), stats)
+
+def build_word_prompt(word: str) -> str:
+    return f"Explain the word '{word}' in simple English for elementary school students. Only return the explanation, do not repeat the word."
+
+def get_simple_english_definition(word: str, stats: Optional[UsageStats] = None) -> str:
+    return _chat(build_word_prompt(word), stats)
+
+def build_batch_prompt(words: List[str]) -> str:
+    return (
+        "Explain each of the following words in simple English for elementary school students. "
+        "Do not repeat the word inside its explanation. "
+        "Reply with only a JSON object that maps each word exactly as given to its explanation.\n"
+        f"Words: {json.dumps(words)}"
+    )
+
+def parse_batch_reply(content: str, words: List[str]) -> Dict[str, str]:
+    """从模型回复中解析 {word: definition}，只保留请求中的单词和非空解释"""
+    text = content.strip()
+    # 去掉 ```json ... ``` 代码块包裹
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            return {}
         try:
-            definitions[word] = get_simple_english_definition(word)
-        except Exception as e:
-            definitions[word] = f"[Error: {e}]"
+            parsed = json.loads(text[start:end + 1])
+        except ValueError:
+            return {}
+    # 兼容 [{"word": ..., "definition": ...}] 形式
+    if isinstance(parsed, list):
+        parsed = {
+            item.get("word"): item.get("definition") or item.get("explanation")
+            for item in parsed if isinstance(item, dict)
+        }
+    if not isinstance(parsed, dict):
+        return {}
+
+    lookup = {w.strip().lower(): w for w in words}
+    definitions = {}
+    for key, value in parsed.items():
+        word = lookup.get(str(key).strip().lower())
+        if word and isinstance(value, str) and value.strip():
+            definitions[word] = value.strip()
+    return definitions
+
+def get_batch_definitions(words: List[str], stats: Optional[UsageStats] = None) -> Dict[str, str]:
+    """一次请求获取多个单词的解释，返回成功解析的部分"""
+    content = _chat(build_batch_prompt(words), stats, json_mode=True)
+    return parse_batch_reply(content, words)
+
+def is_error_definition(definition: str) -> bool:
+    return definition.startswith("[Error:")
+
+def _safe_definition(word: str, stats: Optional[UsageStats] = None) -> str:
+    try:
+        return get_simple_english_definition(word, stats)
+    except Exception as e:
+        return f"[Error: {e}]"
+
+def _failed_batch(words: List[str], error: Exception) -> Dict[str, str]:
+    # 请求本身失败（已按 LLM_MAX_RETRIES 重试）时整批记为错误，不再拆分重试，
+    # 否则限流或服务故障时请求数会成倍增加
+    return {w: f"[Error: {error}]" for w in words}
+
+def _define_batch(words: List[str], stats: Optional[UsageStats] = None) -> Dict[str, str]:
+    # 收到回复但缺失或格式错误的单词，缩小批次后重试，最终退化为单词请求
+    if len(words) == 1:
+        return {words[0]: _safe_definition(words[0], stats)}
+    try:
+        definitions = get_batch_definitions(words, stats)
+    except Exception as e:
+        return _failed_batch(words, e)
+    missing = [w for w in words if w not in definitions]
+    if len(missing) == len(words):
+        half = len(words) // 2
+        definitions.update(_define_batch(words[:half], stats))
+        definitions.update(_define_batch(words[half:], stats))
+    elif missing:
+        definitions.update(_define_batch(missing, stats))
+    return definitions
+
+def _split_batches(words: List[str], batch_size: Optional[int]) -> List[List[str]]:
+    batch_size = max(1, batch_size or LLM_BATCH_SIZE)
+    return [words[i:i + batch_size] for i in range(0, len(words), batch_size)]
+
+def _lookup_cached(unique_words: List[str], use_cache: bool):
+    """返回 (cache, 命中的解释, 待请求的单词)"""
+    cache = get_clue_cache() if use_cache else None
+    definitions = cache.get_many(unique_words, DASHSCOPE_MODEL, PROMPT_VERSION) if cache else {}
+    pending = [w for w in unique_words if w not in definitions]
+    return cache, definitions, pending
+
+def _store_fetched(cache, fetched: Dict[str, str]):
+    if cache:
+        cache.set_many({w: d for w, d in fetched.items() if not is_error_definition(d)},
+                       DASHSCOPE_MODEL, PROMPT_VERSION)
+
+def _log_usage(unique_words: List[str], pending: List[str], stats: UsageStats):
+    """同步和异步版本共用的用量日志（INFO 级别，默认不输出）"""
+    if not pending:
+        logger.info("LLM统计: %d 个单词全部命中缓存", len(unique_words))
+        return
+    usage = stats.to_dict()
+    logger.info("LLM统计: %d 个单词, 缓存命中 %d, %d 次请求, tokens: prompt=%d completion=%d total=%d",
+                len(unique_words), len(unique_words) - len(pending), usage['requests'],
+                usage['prompt_tokens'], usage['completion_tokens'], usage['total_tokens'])
+
+def batch_generate_definitions(words: List[str], max_workers: Optional[int] = None,
+                               batch_size: Optional[int] = None,
+                               stats: Optional[UsageStats] = None,
+                               use_cache: bool = True) -> Dict[str, str]:
+    """并发获取一组单词的解释，单个单词失败时返回错误占位文本
+
+    batch_size > 1 时每次请求携带多个单词，batch_size = 1 时逐词请求。
+    use_cache 为 True 时先查询解释缓存，只为未命中的单词调用 LLM。
+    """
+    unique_words = list(dict.fromkeys(words))
+    if not unique_words:
+        return {}
+    stats = stats if stats is not None else UsageStats()
+    cache, definitions, pending = _lookup_cached(unique_words, use_cache)
+    if pending:
+        tasks = _split_batches(pending, batch_size)
+        workers = max(1, min(max_workers or LLM_CONCURRENCY, len(tasks)))
+        fetched = {}
+        with STAGE_SECONDS.time(stage="llm"), ThreadPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(lambda batch: _define_batch(batch, stats), tasks):
+                fetched.update(result)
+        _store_fetched(cache, fetched)
+        definitions.update(fetched)
+    _log_usage(unique_words, pending, stats)
+    return {w: definitions[w] for w in unique_words}
+
+async def _asafe_definition(word: str, stats: Optional[UsageStats] = None) -> str:
+    try:
+        return await _achat(build_word_prompt(word), stats)
+    except Exception as e:
+        return f"[Error: {e}]"
+
+async def _adefine_batch(words: List[str], stats: Optional[UsageStats] = None) -> Dict[str, str]:
+    # 与 _define_batch 相同的补齐策略
+    if len(words) == 1:
+        return {words[0]: await _asafe_definition(words[0], stats)}
+    try:
+        content = await _achat(build_batch_prompt(words), stats, json_mode=True)
+    except Exception as e:
+        return _failed_batch(words, e)
+    definitions = parse_batch_reply(content, words)
+    missing = [w for w in words if w not in definitions]
+    if len(missing) == len(words):
+        half = len(words) // 2
+        definitions.update(await _adefine_batch(words[:half], stats))
+        definitions.update(await _adefine_batch(words[half:], stats))
+    elif missing:
+        definitions.update(await _adefine_batch(missing, stats))
     return definitions
 
+async def abatch_generate_definitions(words: List[str], max_concurrency: Optional[int] = None,
+                                      batch_size: Optional[int] = None,
+                                      stats: Optional[UsageStats] = None,
+                                      use_cache: bool = True) -> Dict[str, str]:
+    """batch_generate_definitions 的异步版本，使用 httpx 在事件循环内并发请求"""
+    unique_words = list(dict.fromkeys(words))
+    if not unique_words:
+        return {}
+    stats = stats if stats is not None else UsageStats()
+    # 解释缓存的 SQLite 读写是阻塞调用，放到线程中执行，不占用事件循环
+    cache, definitions, pending = await asyncio.to_thread(_lookup_cached, unique_words, use_cache)
+    if pending:
+        semaphore = asyncio.Semaphore(max_concurrency or LLM_CONCURRENCY)
+
+        async def run(batch):
+            async with semaphore:
+                return await _adefine_batch(batch, stats)
+
+        fetched = {}
+        with STAGE_SECONDS.time(stage="llm"):
+            results = await asyncio.gather(*(run(b) for b in _split_batches(pending, batch_size)))
+        for result in results:
+            fetched.update(result)
+        await asyncio.to_thread(_store_fetched, cache, fetched)
+        definitions.update(fetched)
+    _log_usage(unique_words, pending, stats)
+    return {w: definitions[w] for w in unique_words}
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     words = ['apple', 'banana', 'orange', 'grape', 'pear', 'peach']
     defs = batch_generate_definitions(words)
     for w, d in defs.items():
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+本地模拟 DashScope chat-completions 接口，用于离线调试 llm_definition
+
+用法:
+    python llm_stub_server.py --port 8765 --latency 0.2 --fail-rate 0.1
+    DASHSCOPE_API_URL=http://127.0.0.1:8765/v1/chat/completions python llm_definition.py
+"""
+import argparse
+import http.server
+import json
+import random
+import re
+import threading
+import time
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    fail_rate = 0.0
+    drop_rate = 0.0
+
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(content_length).decode('utf-8') or '{}')
+        time.sleep(self.latency)
+
+        # 按比例模拟限流和服务端错误，便于验证重试逻辑
+        if random.random() < self.fail_rate:
+            self.send_json(random.choice([429, 503]), {"error": {"message": "stub failure"}})
+            return
+
+        prompt = data.get('messages', [{}])[-1].get('content', '')
+        content = make_reply(prompt, self.drop_rate)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        self.send_json(200, {
+            "id": "stub",
+            "model": data.get('model', 'stub'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_reply(prompt, drop_rate=0.0):
+    # 批量提示词：按 JSON 返回，并按比例丢弃部分单词以验证补齐逻辑
+    batch = re.search(r"Words: (\[.*\])", prompt)
+    if batch:
+        words = json.loads(batch.group(1))
+        return json.dumps({
+            w: f"A simple explanation of {w.lower()}."
+            for w in words if random.random() >= drop_rate
+        })
+    match = re.search(r"'([^']+)'", prompt)
+    word = match.group(1) if match else 'word'
+    return f"A simple explanation of {word.lower()}."
+
+def start_stub_server(port=0, latency=0.0, fail_rate=0.0, drop_rate=0.0):
+    """在后台线程启动模拟服务器，返回 (server, url)"""
+    handler = type('ConfiguredStubHandler', (StubHandler,),
+                   {'latency': latency, 'fail_rate': fail_rate, 'drop_rate': drop_rate})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, url
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='模拟 DashScope chat-completions 接口')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='返回 429/503 的概率')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='批量回复中丢弃单词的概率')
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.latency, args.fail_rate, args.drop_rate)
+    print(f"模拟LLM接口运行在 {url}")
+    print("按 Ctrl+C 停止服务器")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n服务器已停止")
@@ -1,6 +1,10 @@
+const { COMPACT_MEDIA_TYPE, decodeCompact } = require('../../utils/compact.js')
+const { createSSEParser } = require('../../utils/sse.js')
+
 Page({
   data: {
-    size: 12,
+    rows: 0,
+    cols: 0,
     grid: [],
     layout: [],
     clues: {},
@@ -14,41 +18,96 @@ Page({
     // TODO: 修改为你的API地址
     const api = wx.getStorageSync('api') || 'http://10.10.0.81:8000/api/crossword'
     const words = wx.getStorageSync('words') || ['apple','banana','orange','grape','pear','peach']
+    // 不指定 size，由服务端自动选择尺寸并裁剪到单词的包围盒
+    if (wx.canIUse('RequestTask.onChunkReceived')) this.loadStreaming(api, words)
+    else this.loadCompact(api, words)
+  },
+  // 渐进式加载：布局一到就渲染棋盘，题目描述随后陆续填入
+  loadStreaming(api, words){
+    let received = false
+    const task = wx.request({
+      url: `${api}/stream`,
+      method: 'POST',
+      enableChunked: true,
+      responseType: 'arraybuffer',
+      header: { Accept: 'text/event-stream' },
+      data: { words, use_llm: true },
+      success: (res) => {
+        // 旧版服务端没有流式接口时改用普通接口
+        if (!received) this.loadCompact(api, words)
+      },
+      fail: () => {
+        if (!received) this.loadCompact(api, words)
+        else wx.showToast({ title: '部分题目获取失败', icon: 'none' })
+      }
+    })
+    task.onChunkReceived(createSSEParser((event, data) => {
+      received = true
+      if (event === 'layout') this.setPuzzle(data.grid, data.layout, {})
+      else if (event === 'clues') this.addClues(data)
+      else if (event === 'error') wx.showToast({ title: '获取题目失败', icon: 'none' })
+    }))
+  },
+  loadCompact(api, words){
     wx.request({
       url: api,
       method: 'POST',
-      data: { words, size: 12, use_llm: true },
+      // 请求紧凑格式：只传布局，网格在本地重建
+      header: { Accept: COMPACT_MEDIA_TYPE },
+      data: { words, use_llm: true },
       success: (res) => {
-        const { grid, layout, clues } = res.data
-        const size = grid.length
-        const cells = []
-        for (let r=0; r<size; r++){
-          for (let c=0; c<size; c++){
-            const v = grid[r][c]
-            cells.push({ r, c, value: v ? '' : '', isBlock: !v, focus: false })
-          }
-        }
-        // 预计算方向索引列表和题目列表
-        const acrossIdxs = [], downIdxs = [], acrossList = [], downList = []
-        let numMap = {}
-        let number = 1
-        for (const e of layout) {
-          numMap[`${e.row},${e.col},${e.direction}`] = number++
+        // 旧版服务端不支持紧凑格式时仍返回完整 JSON
+        let data
+        try {
+          data = res.data && res.data.v ? decodeCompact(res.data) : res.data
+        } catch (err) {
+          wx.showToast({ title: '获取题目失败', icon: 'none' })
+          return
         }
-        layout.forEach((e, i)=>{
-          const clue = clues[e.word.toLowerCase()] || ''
-          const num = numMap[`${e.row},${e.col},${e.direction}`]
-          if (e.direction==='across') { acrossIdxs.push(i); acrossList.push({idx:i, num, clue}) }
-          else { downIdxs.push(i); downList.push({idx:i, num, clue}) }
-        })
-        this.setData({ grid, layout, clues, size, cells, currentIndex: 0, currentDirection: 'across', acrossIdxs, downIdxs, acrossList, downList })
-        this.highlightByIndex(0)
+        this.setPuzzle(data.grid, data.layout, data.clues)
       },
       fail: (err) => {
         wx.showToast({ title: '获取题目失败', icon: 'none' })
       }
     })
   },
+  setPuzzle(grid, layout, clues){
+    const rows = grid.length
+    const cols = rows ? grid[0].length : 0
+    const cells = []
+    for (let r=0; r<rows; r++){
+      for (let c=0; c<cols; c++){
+        const v = grid[r][c]
+        cells.push({ r, c, value: v ? '' : '', isBlock: !v, focus: false })
+      }
+    }
+    // 预计算方向索引列表和题目列表
+    const acrossIdxs = [], downIdxs = [], acrossList = [], downList = []
+    let numMap = {}
+    let number = 1
+    for (const e of layout) {
+      numMap[`${e.row},${e.col},${e.direction}`] = number++
+    }
+    layout.forEach((e, i)=>{
+      const clue = clues[e.word.toLowerCase()] || ''
+      const num = numMap[`${e.row},${e.col},${e.direction}`]
+      if (e.direction==='across') { acrossIdxs.push(i); acrossList.push({idx:i, num, clue}) }
+      else { downIdxs.push(i); downList.push({idx:i, num, clue}) }
+    })
+    this.setData({ grid, layout, clues, rows, cols, cells, currentIndex: 0, currentDirection: 'across', acrossIdxs, downIdxs, acrossList, downList })
+    this.highlightByIndex(0)
+  },
+  // 合并新到的题目描述，只更新题目列表和当前提示
+  addClues(newClues){
+    const clues = Object.assign({}, this.data.clues)
+    for (const w in newClues) clues[w.toLowerCase()] = newClues[w]
+    const { layout, currentIndex, currentDirection } = this.data
+    const fill = list => list.map(item => Object.assign({}, item, { clue: clues[layout[item.idx].word.toLowerCase()] || '' }))
+    const entry = layout[currentIndex]
+    const update = { clues, acrossList: fill(this.data.acrossList), downList: fill(this.data.downList) }
+    if (entry) update.currentClue = `${currentDirection.toUpperCase()}: ${clues[entry.word.toLowerCase()] || ''}`
+    this.setData(update)
+  },
   highlightCells(cells){
     // 检查是否需要更新高亮
     const currentHighlighted = this.data.cells.filter(c => c.highlight).map(c => `${c.r},${c.c}`)
@@ -60,7 +119,7 @@ Page({
     const arr = this.data.cells.slice()
     for (let i=0;i<arr.length;i++) arr[i].highlight = false
     for (const {r,c} of cells){
-      const idx = r*this.data.size + c
+      const idx = r*this.data.cols + c
       if (arr[idx]) arr[idx].highlight = true
     }
     this.setData({ cells: arr })
@@ -147,13 +206,13 @@ Page({
     let nextIdx = null
     if (pos < cells.length-1){
       const next = cells[pos+1]
-      nextIdx = next.r * this.data.size + next.c
+      nextIdx = next.r * this.data.cols + next.c
     } else {
       // 回绕到下一单词（同方向优先），若无则智能切换方向到首词
       const { idx: nextEntryIdx } = this.getNextEntryIndex(entry.direction, this.data.currentIndex)
       this.highlightByIndex(nextEntryIdx)
       const nextEntry = this.data.layout[nextEntryIdx]
-      if (nextEntry) nextIdx = nextEntry.row * this.data.size + nextEntry.col
+      if (nextEntry) nextIdx = nextEntry.row * this.data.cols + nextEntry.col
     }
     if (nextIdx !== null && arr[nextIdx] && !arr[nextIdx].isBlock) {
       arr[nextIdx].focus = true
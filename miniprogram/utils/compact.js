@@ -0,0 +1,28 @@
+// 解码 /api/crossword 的紧凑格式（见 compact_payload.py）
+// { v, r: 行数, c: 列数, w: ['单词', ...], p: [(row*cols+col)*2+方向], k: [提示], u: [未放置], s: 种子 }
+const COMPACT_MEDIA_TYPE = 'application/vnd.crossword.compact+json'
+const COMPACT_VERSION = 2
+
+function decodeCompact(payload) {
+  if (payload.v !== COMPACT_VERSION) throw new Error(`不支持的紧凑格式版本: ${payload.v}`)
+  const rows = payload.r, cols = payload.c
+  const words = payload.w
+  const grid = []
+  for (let r = 0; r < rows; r++) grid.push(new Array(cols).fill(''))
+  const layout = [], clues = {}
+  for (let i = 0; i < words.length; i++) {
+    const word = words[i]
+    const packed = payload.p[i]
+    const down = packed % 2
+    const pos = (packed - down) / 2
+    const row = Math.floor(pos / cols), col = pos % cols
+    layout.push({ word, row, col, direction: down ? 'down' : 'across' })
+    for (let j = 0; j < word.length; j++) {
+      grid[row + j * down][col + j * (1 - down)] = word[j]
+    }
+    clues[word.toLowerCase()] = payload.k[i] || ''
+  }
+  return { grid, layout, clues, rows, cols, unplaced: payload.u || [], seed: payload.s }
+}
+
+module.exports = { COMPACT_MEDIA_TYPE, COMPACT_VERSION, decodeCompact }
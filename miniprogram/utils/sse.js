@@ -0,0 +1,53 @@
+// 解析 /api/crossword/stream 的 Server-Sent Events（配合 wx.request 的 enableChunked 使用）
+// 分块可能在 UTF-8 字符或事件中间截断，未完整的部分留到下一块再处理
+
+// 把字节解码为字符串，返回 [文本, 末尾未完整字符的字节数]
+function decodeUtf8(bytes) {
+  let end = bytes.length
+  // 回退到最后一个完整字符的末尾
+  for (let i = Math.max(0, end - 3); i < end; i++) {
+    const b = bytes[i]
+    const need = b >= 0xf0 ? 4 : b >= 0xe0 ? 3 : b >= 0xc0 ? 2 : 1
+    if (need > 1 && i + need > end) { end = i; break }
+  }
+  let out = ''
+  for (let i = 0; i < end;) {
+    const b = bytes[i]
+    let cp, n
+    if (b < 0x80) { cp = b; n = 1 }
+    else if (b >= 0xf0) { cp = b & 0x07; n = 4 }
+    else if (b >= 0xe0) { cp = b & 0x0f; n = 3 }
+    else { cp = b & 0x1f; n = 2 }
+    for (let j = 1; j < n; j++) cp = (cp << 6) | (bytes[i + j] & 0x3f)
+    out += String.fromCodePoint(cp)
+    i += n
+  }
+  return [out, bytes.length - end]
+}
+
+function createSSEParser(onEvent) {
+  let pending = new Uint8Array(0)
+  let buffer = ''
+  return function push(arrayBuffer) {
+    const chunk = new Uint8Array(arrayBuffer)
+    const bytes = new Uint8Array(pending.length + chunk.length)
+    bytes.set(pending)
+    bytes.set(chunk, pending.length)
+    const [text, rest] = decodeUtf8(bytes)
+    pending = bytes.slice(bytes.length - rest)
+    buffer += text
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message', data = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
+module.exports = { createSSEParser }
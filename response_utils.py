@@ -0,0 +1,77 @@
+"""
+HTTP 响应辅助：ETag 计算、条件请求判断和按 Accept-Encoding 压缩
+"""
+import gzip
+import hashlib
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+
+def make_etag(body: bytes) -> str:
+    """根据内容计算弱 ETag，不同压缩编码共用同一个 ETag"""
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 是否命中（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式，优先 br，其次 gzip"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+def encode_body(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """按客户端能力压缩响应体，返回 (body, Content-Encoding)"""
+    if len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    return compress(body, encoding), encoding
+
+def precompress(body: bytes) -> Dict[Optional[str], bytes]:
+    """为静态内容预先生成所有支持的压缩版本，键为 Content-Encoding（None 为原文）"""
+    variants: Dict[Optional[str], bytes] = {None: body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+    return variants
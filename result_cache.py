@@ -0,0 +1,99 @@
+"""
+/api/crossword 结果缓存：按规范化请求的内容哈希缓存整份谜题
+
+相同请求并发到达时只计算一次（single-flight），其余请求等待同一个结果。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from clue_cache import TTLCache
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 3600))
+
+def make_result_key(payload: Dict[str, Any], version: str) -> str:
+    """对规范化后的请求做规范 JSON 序列化，取 sha256 作为缓存键"""
+    canonical = json.dumps({"v": version, "req": payload}, sort_keys=True,
+                           separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """内存结果缓存，带容量/过期淘汰和并发请求合并
+
+    get_or_compute 返回 (value, status, age)，status 为：
+      HIT    命中缓存
+      SHARED 与正在进行的相同请求合并，等待其结果
+      MISS   本次请求实际执行了计算
+    """
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: Optional[float] = RESULT_CACHE_TTL):
+        self.results = TTLCache(max_size, ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool] = lambda value: True
+                             ) -> Tuple[Any, str, float]:
+        cached = self.results.get(key)
+        if cached is not None:
+            value, created_at = cached
+            self.hits += 1
+            return value, "HIT", time.time() - created_at
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            # shield：某个等待者断开连接不应取消其他人共享的计算
+            return await asyncio.shield(task), "SHARED", 0.0
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._compute(key, compute, cacheable))
+        self._inflight[key] = task
+        return await asyncio.shield(task), "MISS", 0.0
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       cacheable: Callable[[Any], bool]) -> Any:
+        try:
+            value = await compute()
+            # 失败（异常）或降级的结果不缓存，下次请求重新计算
+            if cacheable(value):
+                self.results.set(key, (value, time.time()))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def get(self, key: str) -> Any:
+        """取出已缓存的结果并计入命中，未命中返回 None（不计入未命中，由之后的 get_or_compute 统计）"""
+        cached = self.results.get(key)
+        if cached is None:
+            return None
+        self.hits += 1
+        return cached[0]
+
+    def peek(self, key: str) -> Any:
+        """只查询已缓存的结果（不计入命中统计，不等待进行中的计算），未命中返回 None"""
+        cached = self.results.get(key)
+        return cached[0] if cached is not None else None
+
+    def put(self, key: str, value: Any):
+        """写入在 get_or_compute 之外计算出的结果（如流式接口逐步拼出的谜题）"""
+        self.results.set(key, (value, time.time()))
+
+    def clear(self):
+        self.results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared + self.misses
+        return {
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared) / lookups, 4) if lookups else 0.0,
+            "size": len(self.results),
+            "inflight": len(self._inflight),
+        }
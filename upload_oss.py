@@ -1,32 +1,188 @@
+import gzip
+import hashlib
+import mimetypes
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-import oss2
+
+load_dotenv()
+
+# oss：阿里云 OSS；local：写入本地目录（离线调试用）
+UPLOAD_BACKEND = os.getenv('UPLOAD_BACKEND', 'oss')
+UPLOAD_LOCAL_DIR = os.getenv('UPLOAD_LOCAL_DIR', os.path.join('output', 'uploads'))
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', 8))
+# 按内容哈希命名的对象内容不会变化，可以长期缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 指定名称的对象可能被覆盖，只短期缓存
+MUTABLE_CACHE_CONTROL = os.getenv('UPLOAD_CACHE_CONTROL', 'public, max-age=300')
+# 这些类型上传前先 gzip 压缩
+GZIP_TYPES = ('text/', 'application/json', 'application/javascript')
+
+def content_object_name(data: bytes, ext: str = 'html', length: int = 16) -> str:
+    """按内容哈希生成对象名，相同内容总是得到相同的名称"""
+    return hashlib.sha256(data).hexdigest()[:length] + '.' + ext
+
+def guess_content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+class Uploader:
+    """上传客户端基类，子类实现 exists / put / url_for
+
+    object_name 为空时按内容哈希命名，已存在的对象直接跳过；文本类内容
+    以 gzip 编码上传并设置 Content-Encoding 和 Cache-Control（compress 为 False 的后端不压缩）。
+    """
+    # 后端是否按 Content-Encoding 提供内容；不支持的后端保存原始内容
+    compress = True
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self.uploaded = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str]):
+        raise NotImplementedError
+
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+    def upload_bytes(self, data: bytes, object_name: Optional[str] = None, ext: str = 'html',
+                     content_type: Optional[str] = None) -> str:
+        content_addressed = object_name is None
+        if content_addressed:
+            object_name = content_object_name(data, ext)
+        key = self.prefix + object_name
+        # exists 与 put 之间没有加锁：并发上传同一内容时两边都可能执行 put，
+        # 但内容哈希相同的对象字节完全一致，重复写入只是多一次上传，结果不变
+        if content_addressed and self.exists(key):
+            with self._lock:
+                self.skipped += 1
+            return self.url_for(key)
+
+        content_type = content_type or guess_content_type(object_name)
+        headers = {
+            'Content-Type': content_type,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if content_addressed else MUTABLE_CACHE_CONTROL,
+        }
+        body = data
+        if self.compress and content_type.startswith(GZIP_TYPES):
+            body = gzip.compress(data, compresslevel=9, mtime=0)
+            headers['Content-Encoding'] = 'gzip'
+        self.put(key, body, headers)
+        with self._lock:
+            self.uploaded += 1
+        return self.url_for(key)
+
+    def upload_file(self, file_path: str, object_name: Optional[str] = None) -> str:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(file_path)[1].lstrip('.') or 'bin'
+        return self.upload_bytes(data, object_name, ext, guess_content_type(object_name or file_path))
+
+    def upload_many(self, file_paths: List[str], max_workers: int = UPLOAD_CONCURRENCY) -> List[str]:
+        """并发上传多个文件，按输入顺序返回 URL"""
+        if not file_paths:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as pool:
+            return list(pool.map(self.upload_file, file_paths))
+
+class OSSUploader(Uploader):
+    """阿里云 OSS 上传客户端，复用同一个 Bucket 和连接池"""
+    def __init__(self, endpoint: str, bucket_name: str, access_key_id: str,
+                 access_key_secret: str, prefix: str = ''):
+        super().__init__(prefix)
+        import oss2
+        self.endpoint = endpoint
+        self.bucket_name = bucket_name
+        self.bucket = oss2.Bucket(oss2.Auth(access_key_id, access_key_secret), endpoint,
+                                  bucket_name, session=oss2.Session())
+        host = endpoint.replace('https://', '').replace('http://', '')
+        self.base_url = f'https://{bucket_name}.{host}/'
+
+    @classmethod
+    def from_env(cls) -> 'OSSUploader':
+        config = [os.getenv(name) for name in
+                  ('OSS_ENDPOINT', 'OSS_BUCKET', 'OSS_ACCESS_KEY_ID', 'OSS_ACCESS_KEY_SECRET')]
+        if not all(config):
+            raise ValueError('请在.env中配置OSS_ENDPOINT, OSS_BUCKET, OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET')
+        return cls(*config, prefix=os.getenv('OSS_PREFIX', ''))
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.object_exists(key)
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str]):
+        result = self.bucket.put_object(key, body, headers=headers)
+        if result.status != 200:
+            raise IOError(f'上传失败: {result.status}')
+
+    def url_for(self, key: str) -> str:
+        return self.base_url + key
+
+class LocalUploader(Uploader):
+    """写入本地目录的上传后端，用于离线调试；响应头记录在 metadata 中
+
+    通过 file:// 打开时没有 Content-Encoding，文件保存未压缩的原始内容。
+    """
+    compress = False
+
+    def __init__(self, directory: str = UPLOAD_LOCAL_DIR, base_url: Optional[str] = None,
+                 prefix: str = ''):
+        super().__init__(prefix)
+        self.directory = directory
+        self.base_url = base_url
+        self.metadata: Dict[str, Dict[str, str]] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split('/'))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，并发上传同一对象时不会读到半个文件
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        self.metadata[key] = headers
+
+    def url_for(self, key: str) -> str:
+        if self.base_url:
+            return self.base_url.rstrip('/') + '/' + key
+        return 'file://' + os.path.abspath(self._path(key))
+
+_uploader: Optional[Uploader] = None
+_uploader_lock = threading.Lock()
+
+def get_uploader() -> Uploader:
+    """返回进程内共享的上传客户端，后端由 UPLOAD_BACKEND 选择"""
+    global _uploader
+    if _uploader is None:
+        with _uploader_lock:
+            if _uploader is None:
+                _uploader = LocalUploader() if UPLOAD_BACKEND == 'local' else OSSUploader.from_env()
+    return _uploader
 
 def upload_to_oss(file_path, object_name=None):
-    load_dotenv()
-    OSS_ENDPOINT = os.getenv('OSS_ENDPOINT')
-    OSS_BUCKET = os.getenv('OSS_BUCKET')
-    OSS_ACCESS_KEY_ID = os.getenv('OSS_ACCESS_KEY_ID')
-    OSS_ACCESS_KEY_SECRET = os.getenv('OSS_ACCESS_KEY_SECRET')
-    if not all([OSS_ENDPOINT, OSS_BUCKET, OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET]):
-        raise ValueError('请在.env中配置OSS_ENDPOINT, OSS_BUCKET, OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET')
-    auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
-    bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET)
-    if object_name is None:
-        object_name = os.path.basename(file_path)
-    with open(file_path, 'rb') as f:
-        result = bucket.put_object(
-            object_name,
-            f,
-            headers={'Content-Type': 'text/html'}
-        )
-    if result.status == 200:
-        url = f'https://{OSS_BUCKET}.{OSS_ENDPOINT.replace("https://","").replace("http://","")}/{object_name}'
-        print(f'上传成功: {url}')
-        return url
-    else:
-        print(f'上传失败: {result.status}')
+    """上传单个文件，object_name 为空时按内容哈希命名，失败返回 None"""
+    try:
+        url = get_uploader().upload_file(file_path, object_name)
+    except Exception as e:
+        print(f'上传失败: {e}')
         return None
+    print(f'上传成功: {url}')
+    return url
 
 if __name__ == '__main__':
     upload_to_oss('crossword.html')
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+词表包：把一组单词、它们的 LLM 提示和若干预生成的布局存成一个文件
+
+文件格式（小端）：
+    4 字节魔数 b'CWPK' | 2 字节版本 | 4 字节头部长度 | 头部 JSON | 布局数据
+头部记录单词、提示和每个布局在数据区中的偏移；布局按紧凑 JSON 单独存放，
+加载时用 mmap 映射文件，只在取用某个布局时才解码。
+
+用法:
+    python word_pack.py build words.txt -o packs/words.pack --layouts 32
+    python word_pack.py info packs/words.pack
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from clue_cache import normalize_word
+
+PACK_MAGIC = b'CWPK'
+PACK_VERSION = 1
+PACK_DIR = os.getenv("PACK_DIR", "packs")
+_PREFIX = struct.Struct('<4sHI')
+_DIRECTIONS = {'across': 'a', 'down': 'd'}
+_DIRECTION_NAMES = {v: k for k, v in _DIRECTIONS.items()}
+
+def word_set_key(words: List[str]) -> frozenset:
+    """词表匹配用的键：忽略大小写、空白和顺序"""
+    return frozenset(normalize_word(w) for w in words if w.strip())
+
+def encode_layout(grid: List[List[str]], layout: List[Dict]) -> bytes:
+    rows = [''.join(ch or '.' for ch in row) for row in grid]
+    entries = [[e['word'], e['row'], e['col'], _DIRECTIONS[e['direction']]] for e in layout]
+    return json.dumps({'g': rows, 'l': entries}, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def decode_layout(blob: bytes) -> Tuple[List[List[str]], List[Dict]]:
+    data = json.loads(blob)
+    grid = [['' if ch == '.' else ch for ch in row] for row in data['g']]
+    layout = [{'word': w, 'row': r, 'col': c, 'direction': _DIRECTION_NAMES[d]} for w, r, c, d in data['l']]
+    return grid, layout
+
+def write_pack(path: str, name: str, words: List[str], clues: Dict[str, str],
+               layouts: List[Tuple[List[List[str]], List[Dict], int]], meta: Optional[Dict] = None):
+    """写入词表包；先写临时文件再改名，正在使用旧文件的进程不受影响"""
+    blobs, entries, offset = [], [], 0
+    for grid, layout, seed in layouts:
+        blob = encode_layout(grid, layout)
+        entries.append({'offset': offset, 'length': len(blob), 'seed': seed,
+                        'rows': len(grid), 'cols': len(grid[0]) if grid else 0, 'placed': len(layout)})
+        blobs.append(blob)
+        offset += len(blob)
+    header = dict(meta or {})
+    header.update({'name': name, 'words': words, 'clues': clues, 'layouts': entries})
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(PACK_MAGIC, PACK_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+class WordPack:
+    """只读的词表包，布局数据通过 mmap 按需读取"""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != PACK_MAGIC:
+            self._mmap.close()
+            raise ValueError(f'不是词表包文件: {path}')
+        if version != PACK_VERSION:
+            self._mmap.close()
+            raise ValueError(f'不支持的词表包版本 {version}: {path}')
+        start = _PREFIX.size
+        self.header = json.loads(self._mmap[start:start + header_length])
+        self._data_offset = start + header_length
+        self.name: str = self.header['name']
+        self.words: List[str] = self.header['words']
+        self.clues: Dict[str, str] = self.header['clues']
+        self.key = word_set_key(self.words)
+
+    def __len__(self) -> int:
+        return len(self.header['layouts'])
+
+    def get(self, index: int) -> Tuple[List[List[str]], List[Dict], int]:
+        """返回第 index 个布局的 (grid, layout, seed)"""
+        entry = self.header['layouts'][index]
+        start = self._data_offset + entry['offset']
+        grid, layout = decode_layout(self._mmap[start:start + entry['length']])
+        return grid, layout, entry['seed']
+
+    def pick(self, seed: Optional[int] = None) -> Tuple[int, List[List[str]], List[Dict], int]:
+        """按 seed 选择布局（未指定时随机），返回 (序号, grid, layout, seed)"""
+        index = seed % len(self) if seed is not None else random.randrange(len(self))
+        return (index,) + self.get(index)
+
+    def clues_for(self, words: List[str]) -> Dict[str, str]:
+        """按请求中的原始写法返回提示"""
+        by_key = {normalize_word(w): clue for w, clue in self.clues.items()}
+        return {w: by_key[normalize_word(w)] for w in words if normalize_word(w) in by_key}
+
+    def info(self) -> Dict:
+        return {
+            'name': self.name,
+            'words': len(self.words),
+            'layouts': len(self),
+            'model': self.header.get('model'),
+            'created_at': self.header.get('created_at'),
+        }
+
+    def close(self):
+        self._mmap.close()
+
+def load_packs(directory: str = PACK_DIR) -> Dict[str, WordPack]:
+    """加载目录下所有 .pack 文件，损坏的文件跳过并打印原因"""
+    packs: Dict[str, WordPack] = {}
+    if not os.path.isdir(directory):
+        return packs
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.pack'):
+            continue
+        try:
+            pack = WordPack(os.path.join(directory, filename))
+        except (OSError, ValueError) as e:
+            print(f'跳过词表包 {filename}: {e}')
+            continue
+        if len(pack) == 0:
+            pack.close()
+            continue
+        packs[pack.name] = pack
+    return packs
+
+def build_pack(words: List[str], path: str, name: Optional[str] = None, layouts: int = 16,
+               attempts: int = 4, size: Optional[int] = None, seed: int = 0,
+               use_llm: bool = True) -> Dict:
+    """离线生成词表包：用现有生成器生成多个不同的布局，用 LLM（经缓存）生成提示"""
+    from crossword_generator import generate_best_crossword, GENERATOR_VERSION
+    from llm_definition import batch_generate_definitions, DASHSCOPE_MODEL, PROMPT_VERSION, is_error_definition
+
+    words = list(dict.fromkeys(w.strip() for w in words if w.strip()))
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    results, seen = [], set()
+    # 布局可能重复，多尝试几次以凑够不同的布局
+    for i in range(layouts * 3):
+        if len(results) >= layouts:
+            break
+        grid, layout, used_seed = generate_best_crossword(words, size, attempts, seed + i * 1000)
+        key = tuple(''.join(ch or '.' for ch in row) for row in grid)
+        if key not in seen:
+            seen.add(key)
+            results.append((grid, layout, used_seed))
+    if use_llm:
+        clues = batch_generate_definitions(words)
+        failed = [w for w, clue in clues.items() if is_error_definition(clue)]
+        if failed:
+            raise RuntimeError(f'{len(failed)} 个单词的提示生成失败，请稍后重试: {failed[:5]}')
+    else:
+        clues = {w: f"What is '{w}'?" for w in words}
+    meta = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'generator_version': GENERATOR_VERSION,
+        'model': DASHSCOPE_MODEL if use_llm else None,
+        'prompt_version': PROMPT_VERSION if use_llm else None,
+    }
+    write_pack(path, name, words, clues, results, meta)
+    return {'name': name, 'path': path, 'words': len(words), 'layouts': len(results),
+            'bytes': os.path.getsize(path)}
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='词表包工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='由单词列表文件生成词表包')
+    build.add_argument('words_file')
+    build.add_argument('-o', '--output', help=f'输出文件，默认 {PACK_DIR}/<词表文件名>.pack')
+    build.add_argument('--name', help='词表包名称，默认取输出文件名')
+    build.add_argument('--layouts', type=int, default=16, help='预生成的布局数')
+    build.add_argument('--attempts', type=int, default=4, help='每个布局的候选数')
+    build.add_argument('--size', type=int, default=None)
+    build.add_argument('--seed', type=int, default=0)
+    build.add_argument('--no-llm', action='store_true', help='不调用 LLM，使用占位提示')
+    info = sub.add_parser('info', help='查看词表包内容')
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        with open(args.words_file, 'r', encoding='utf-8') as f:
+            word_list = [line.strip() for line in f if line.strip()]
+        output = args.output or os.path.join(
+            PACK_DIR, os.path.splitext(os.path.basename(args.words_file))[0] + '.pack')
+        print(build_pack(word_list, output, args.name, args.layouts, args.attempts, args.size,
+                         args.seed, not args.no_llm))
+    else:
+        pack = WordPack(args.path)
+        print(json.dumps(pack.info(), ensure_ascii=False, indent=2))
+        for i, entry in enumerate(pack.header['layouts']):
+            print(f"#{i}: {entry['rows']}x{entry['cols']}, {entry['placed']} 个单词, seed={entry['seed']}")
+        pack.close()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+批量导出可打印的练习纸：每个谜题一页学生卷和一页答案
+
+输出为一个分页的 HTML 文档（浏览器打印为 A4），或一个 zip 包
+（students/<序号>-<id>.html、answers/<序号>-<id>.html 和共用的 worksheet.css）。
+渲染在进程池中进行，结果按输入顺序边渲染边写入磁盘，内存中只保留
+有限个在途的谜题。
+
+输入可以是：
+  - .jsonl / .ndjson：每行一个谜题 {"id", "title", "grid", "layout", "clues"}，
+    可以直接使用 /api/crossword/batch 的输出（summary 和 error 行会被跳过）
+  - 词表目录或 .jsonl 清单（格式同 crossword_pipeline.load_jobs），此时在工作进程中生成布局
+
+用法:
+    python worksheet_export.py puzzles.ndjson -o class-pack.html
+    python worksheet_export.py wordlists/ -o class-pack.zip --no-llm
+"""
+import argparse
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from crossword_generator import generate_crossword, GENERATOR_WORKERS
+
+# 同时在途的谜题数 = 进程数 × 该倍数，限制内存占用
+EXPORT_INFLIGHT_FACTOR = int(os.getenv("EXPORT_INFLIGHT_FACTOR", 4))
+# A4 纵向、页边距 12mm 时的可用宽度，网格按列数缩放到不超过该宽度
+PRINT_WIDTH_MM = 186
+MAX_CELL_MM = 9.0
+
+WORKSHEET_CSS = """
+@page { size: A4; margin: 12mm; }
+* { box-sizing: border-box; }
+body { margin: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; color: #000; }
+.sheet { break-after: page; page-break-after: always; }
+.sheet:last-child { break-after: auto; page-break-after: auto; }
+.sheet-header { display: flex; justify-content: space-between; align-items: baseline;
+    border-bottom: 2px solid #000; margin-bottom: 6mm; }
+.sheet-header h1 { font-size: 16pt; margin: 0 0 2mm; }
+.sheet-fields { font-size: 10pt; }
+.grid { display: grid; grid-template-columns: repeat(var(--cols), var(--cell));
+    grid-auto-rows: var(--cell); margin: 0 auto 6mm; width: max-content; }
+.grid div { position: relative; border: 0.3mm solid #000; margin: -0.15mm; }
+.grid .b { background: #000; }
+.grid sup { position: absolute; top: 0.3mm; left: 0.6mm; font-size: calc(var(--cell) * 0.3); line-height: 1; }
+.grid span { display: flex; height: 100%; align-items: center; justify-content: center;
+    font-weight: bold; font-size: calc(var(--cell) * 0.55); }
+.clues { columns: 2; column-gap: 8mm; font-size: 10pt; }
+.clues h2 { font-size: 11pt; margin: 0 0 2mm; }
+.clues ol { list-style: none; padding: 0; margin: 0 0 4mm; }
+.clues li { break-inside: avoid; margin-bottom: 1.5mm; }
+.clues b { display: inline-block; min-width: 7mm; }
+.answer-key .sheet-header { border-bottom-style: dashed; }
+"""
+
+def _open_document(title: str, css: str) -> str:
+    return (f'<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="UTF-8">\n'
+            f'<title>{html.escape(title)}</title>\n{css}\n</head>\n<body>\n')
+
+_CLOSE_DOCUMENT = '</body>\n</html>\n'
+
+def render_sheets(puzzle: Dict) -> Tuple[str, str]:
+    """渲染一个谜题的学生卷和答案页（各为一个 .sheet 片段），在工作进程中执行"""
+    grid, layout = puzzle['grid'], puzzle['layout']
+    # 提示的键是请求中的原始写法，统一按小写查找
+    clues = {w.lower(): clue for w, clue in (puzzle.get('clues') or {}).items()}
+    title = html.escape(str(puzzle.get('title') or puzzle.get('id') or '填字游戏'))
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    cell_mm = min(MAX_CELL_MM, PRINT_WIDTH_MM / max(cols, 1))
+    grid_style = f'style="--cols:{cols};--cell:{cell_mm:.2f}mm"'
+
+    # 编号与交互版页面一致：按布局顺序从 1 开始，同一起点取第一个
+    numbers: Dict[Tuple[int, int], int] = {}
+    across, down = [], []
+    for number, entry in enumerate(layout, 1):
+        numbers.setdefault((entry['row'], entry['col']), number)
+        clue = html.escape(clues.get(entry['word'].lower(), entry['word']))
+        item = f'<li><b>{number}.</b> {clue}</li>'
+        (across if entry['direction'] == 'across' else down).append(item)
+    clues_html = (f'<div class="clues"><h2>横向</h2><ol>{"".join(across)}</ol>'
+                  f'<h2>纵向</h2><ol>{"".join(down)}</ol></div>')
+
+    student, answer = [], []
+    for r in range(rows):
+        row = grid[r]
+        for c in range(cols):
+            letter = row[c]
+            if not letter:
+                student.append('<div class="b"></div>')
+                answer.append('<div class="b"></div>')
+                continue
+            number = numbers.get((r, c))
+            sup = f'<sup>{number}</sup>' if number else ''
+            student.append(f'<div>{sup}</div>')
+            answer.append(f'<div>{sup}<span>{letter}</span></div>')
+
+    student_sheet = (
+        f'<section class="sheet"><header class="sheet-header"><h1>{title}</h1>'
+        f'<div class="sheet-fields">姓名 ________ 班级 ______ 日期 ______</div></header>'
+        f'<div class="grid" {grid_style}>{"".join(student)}</div>{clues_html}</section>\n')
+    answer_sheet = (
+        f'<section class="sheet answer-key"><header class="sheet-header"><h1>{title} · 答案</h1>'
+        f'</header><div class="grid" {grid_style}>{"".join(answer)}</div>{clues_html}</section>\n')
+    return student_sheet, answer_sheet
+
+def _prepare_and_render(puzzle: Dict) -> Tuple[str, str, str]:
+    """工作进程入口：缺少布局时先生成布局，返回 (id, 学生卷, 答案页)"""
+    if 'layout' not in puzzle:
+        grid, layout = generate_crossword(puzzle['words'], seed=puzzle.get('seed'))
+        puzzle = dict(puzzle, grid=grid, layout=layout)
+    return (puzzle['id'],) + render_sheets(puzzle)
+
+def _is_puzzle_file(source: str) -> bool:
+    """按第一条记录判断 .jsonl 是谜题（含 layout）还是词表清单"""
+    if os.path.isdir(source) or not source.endswith(('.jsonl', '.ndjson')):
+        return False
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                return 'layout' in entry or 'words' not in entry and 'path' not in entry
+    return True
+
+def load_puzzles(source: str, use_llm: bool = True) -> Iterator[Dict]:
+    """逐个产出待导出的谜题
+
+    谜题文件逐行读取（不一次读入内存）；词表任务的所有单词合并去重后统一获取提示
+    （经解释缓存），布局留给工作进程生成。
+    """
+    if not _is_puzzle_file(source):
+        from crossword_pipeline import load_jobs
+        jobs = load_jobs(source)
+        words = [w for job in jobs for w in job['words']]
+        if use_llm:
+            from llm_definition import batch_generate_definitions
+            definitions = batch_generate_definitions(words)
+        else:
+            definitions = {w: f"What is '{w}'?" for w in words}
+        by_lower = {w.lower(): clue for w, clue in definitions.items()}
+        for job in jobs:
+            yield dict(job, clues={w.lower(): by_lower.get(w.lower(), w) for w in job['words']})
+        return
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            # /api/crossword/batch 输出中的 summary 和 error 行没有布局
+            if 'layout' not in entry:
+                continue
+            entry.setdefault('id', str(entry.get('index', line_no)))
+            yield entry
+
+def _ordered_results(pool: ProcessPoolExecutor, puzzles: Iterable[Dict],
+                     inflight: int) -> Iterator[Tuple[str, str, str]]:
+    """按输入顺序产出渲染结果，最多 inflight 个任务同时提交，避免一次读入全部结果"""
+    window = []
+    for puzzle in puzzles:
+        window.append(pool.submit(_prepare_and_render, puzzle))
+        if len(window) >= inflight:
+            yield window.pop(0).result()
+    for future in window:
+        yield future.result()
+
+def export_worksheets(puzzles: Iterable[Dict], output: str, title: str = '填字游戏练习',
+                      workers: Optional[int] = None, answers_last: bool = True) -> Dict:
+    """把谜题渲染为可打印的练习纸，output 以 .zip 结尾时输出 zip 包，否则输出单个 HTML
+
+    单个 HTML 中默认先排全部学生卷、再排全部答案（answers_last），答案先写入临时文件，
+    最后拼接到文档末尾；answers_last 为 False 时每份学生卷后紧跟其答案。
+    """
+    start = time.perf_counter()
+    workers = workers or GENERATOR_WORKERS
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    tmp_path = output + '.tmp'
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = _ordered_results(pool, puzzles, workers * EXPORT_INFLIGHT_FACTOR)
+        if output.endswith('.zip'):
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                # 样式只写一份，所有页面通过相对路径引用
+                zf.writestr('worksheet.css', WORKSHEET_CSS)
+                head = _open_document(title, '<link rel="stylesheet" href="../worksheet.css">')
+                for puzzle_id, student, answer in results:
+                    count += 1
+                    # 序号前缀保证文件按输入顺序排列且不重名
+                    name = f"{count:04d}-{re.sub(r'[^A-Za-z0-9_.-]+', '-', str(puzzle_id)).strip('-')}.html"
+                    zf.writestr(f'students/{name}', head + student + _CLOSE_DOCUMENT)
+                    zf.writestr(f'answers/{name}', head + answer + _CLOSE_DOCUMENT)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as out, \
+                    tempfile.TemporaryFile('w+', encoding='utf-8') as answers:
+                out.write(_open_document(title, f'<style>{WORKSHEET_CSS}</style>'))
+                for _, student, answer in results:
+                    out.write(student)
+                    if answers_last:
+                        answers.write(answer)
+                    else:
+                        out.write(answer)
+                    count += 1
+                answers.seek(0)
+                shutil.copyfileobj(answers, out)
+                out.write(_CLOSE_DOCUMENT)
+    os.replace(tmp_path, output)
+    return {'output': output, 'puzzles': count, 'bytes': os.path.getsize(output),
+            'seconds': round(time.perf_counter() - start, 3)}
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='批量导出可打印的练习纸（学生卷 + 答案）')
+    parser.add_argument('source', help='谜题 .jsonl/.ndjson，或词表目录 / 词表清单')
+    parser.add_argument('-o', '--output', default='worksheets.html', help='输出 .html 或 .zip')
+    parser.add_argument('--title', default='填字游戏练习')
+    parser.add_argument('--workers', type=int, default=GENERATOR_WORKERS)
+    parser.add_argument('--interleave', action='store_true', help='每份学生卷后紧跟其答案')
+    parser.add_argument('--no-llm', action='store_true', help='词表任务不调用 LLM，使用占位提示')
+    args = parser.parse_args()
+
+    summary = export_worksheets(load_puzzles(args.source, not args.no_llm), args.output,
+                                args.title, args.workers, not args.interleave)
+    print(f"已导出 {summary['puzzles']} 个谜题 -> {summary['output']} "
+          f"({summary['bytes'] // 1024} KB, {summary['seconds']}s)")